@@ -6,3 +6,4 @@ admin.site.register(models.Question)
 admin.site.register(models.Answer)
 admin.site.register(models.Tag)
 admin.site.register(models.Like)
+admin.site.register(models.HotSnapshot)
@@ -0,0 +1,100 @@
+"""Precompressed variants of the collected static files.
+
+buildstatic writes gzip and, when the brotli package is installed, brotli variants
+next to every collected file and lists them in ENCODED_MANIFEST_NAME. StaticFilesMiddleware
+loads that manifest once and serves the files from it.
+"""
+import gzip
+import json
+import mimetypes
+from pathlib import Path
+
+from django.contrib.staticfiles import storage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODED_MANIFEST_NAME = 'staticfiles.encoded.json'
+ENCODED_MANIFEST_VERSION = 1
+# Preferred first
+ENCODINGS = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 256
+
+
+class ManifestStaticFilesStorage(storage.ManifestStaticFilesStorage):
+    """Fingerprinting storage rewriting references in CSS only.
+
+    bootstrap.min.js points to a source map which is not shipped, and the default
+    sourceMappingURL pattern for *.js fails the whole collectstatic on it. Until buildstatic
+    has collected the files, {% static %} falls back to the original names instead of failing.
+    """
+    patterns = tuple(
+        (glob, patterns) for glob, patterns in storage.ManifestStaticFilesStorage.patterns if glob == '*.css'
+    )
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Neither in the manifest nor collected into STATIC_ROOT yet
+            return name
+
+
+def is_compressible(path):
+    content_type, _ = mimetypes.guess_type(str(path))
+    return content_type is not None and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=11)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def available_encodings():
+    return [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def write_encoded_variants(root, name):
+    """Write compressed variants of the file, keeping only those smaller than the original"""
+    path = Path(root) / name
+    if not is_compressible(path):
+        return []
+
+    content = path.read_bytes()
+    if len(content) < MIN_COMPRESS_SIZE:
+        return []
+
+    encodings = []
+    for encoding in available_encodings():
+        compressed = compress(content, encoding)
+        variant_path = path.with_name(path.name + ENCODINGS[encoding])
+        if len(compressed) < len(content):
+            variant_path.write_bytes(compressed)
+            encodings.append(encoding)
+        else:
+            variant_path.unlink(missing_ok=True)
+    return encodings
+
+
+def write_encoded_manifest(root, files):
+    manifest = {'version': ENCODED_MANIFEST_VERSION, 'files': files}
+    (Path(root) / ENCODED_MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+
+def read_encoded_manifest(root):
+    manifest_path = Path(root) / ENCODED_MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get('version') != ENCODED_MANIFEST_VERSION:
+        return None
+    return manifest['files']
@@ -0,0 +1,88 @@
+"""Async variants of the questions pages.
+
+Django 4.0 has no async ORM, so every blocking call runs in a worker thread of its own
+(sync_to_async with thread_sensitive=False) and independent parts of a page are loaded
+concurrently with asyncio.gather. The sync views in app.views stay the default routes.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import render
+
+from app import views
+
+
+def run_in_thread(func, *args, **kwargs):
+    @functools.wraps(func)
+    def run_and_release_connections():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Worker threads outlive the request, their connections are never closed by request_finished
+            close_old_connections()
+
+    return sync_to_async(run_and_release_connections, thread_sensitive=False)()
+
+
+class AsyncConditionalGetMixin:
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Django 4.0 View.as_view does not mark views with async handlers as coroutines
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return self.http_method_not_allowed(request, *args, **kwargs)
+
+        response, headers = await run_in_thread(self.check_conditions, request, *args, **kwargs)
+        if response is None:
+            response = await self.get(request, *args, **kwargs)
+        return self.add_validator_headers(response, headers)
+
+
+class AsyncQuestionsContainPageMixin(AsyncConditionalGetMixin):
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        passing_arguments = self.get_view_specific_data(request, *args, **kwargs)
+        sidebar_data, questions_page = await asyncio.gather(
+            run_in_thread(views.load_sidebar_data),
+            run_in_thread(self.get_questions_page, request),
+        )
+        passing_arguments.update(sidebar_data)
+        passing_arguments.update({self.question_objects_template_naming: questions_page})
+
+        return await run_in_thread(render, request, self.template, passing_arguments)
+
+
+class AsyncIndexView(AsyncQuestionsContainPageMixin, views.IndexView):
+    pass
+
+
+class AsyncHotQuestionsView(AsyncQuestionsContainPageMixin, views.HotQuestionsView):
+    pass
+
+
+class AsyncTagQuestionsView(AsyncQuestionsContainPageMixin, views.TagQuestionsView):
+    pass
+
+
+class AsyncSearchQuestionsView(AsyncQuestionsContainPageMixin, views.SearchQuestionsView):
+    pass
+
+
+class AsyncConcreteQuestionView(AsyncConditionalGetMixin, views.ConcreteQuestionView):
+    async def get(self, request: HttpRequest, question_id) -> HttpResponse:
+        sidebar_data, question, answers = await asyncio.gather(
+            run_in_thread(views.load_sidebar_data),
+            run_in_thread(self.get_question_data, question_id),
+            run_in_thread(self.get_answers_page, request, question_id),
+        )
+        passing_arguments = sidebar_data
+        passing_arguments.update({'question': question})
+        passing_arguments.update({'answers': answers})
+
+        return await run_in_thread(render, request, "question.html", passing_arguments)
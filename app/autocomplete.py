@@ -0,0 +1,86 @@
+"""In-process prefix index of tag names for autocomplete.
+
+The index is a sorted list of lowercased tag names, a prefix maps to one contiguous
+slice of it found by bisection, and the slice is ranked by questions count. It is loaded
+with one query on first use and kept current by the tag signals of this process; tags
+changed by other processes are picked up when the index gets older than TAG_INDEX_MAX_AGE.
+"""
+import bisect
+import heapq
+import threading
+import time
+
+from django.conf import settings
+from django.db import models
+
+from app.models import Tag
+
+SUGGESTIONS_AMOUNT = 10
+
+
+class TagIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []
+        self.tags = {}
+        self.loaded_at = None
+
+    def is_loaded(self):
+        return self.loaded_at is not None
+
+    def load(self):
+        tags = Tag.objects \
+            .annotate(total=models.Count('question')) \
+            .values_list('tag_name', 'total')
+        entries = {tag_name.lower(): [tag_name, total] for tag_name, total in tags}
+        with self.lock:
+            self.tags = entries
+            self.keys = sorted(entries)
+            self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > settings.TAG_INDEX_MAX_AGE:
+            self.load()
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def add_tag(self, tag_name, total=0):
+        key = tag_name.lower()
+        with self.lock:
+            if not self.is_loaded() or key in self.tags:
+                return
+            self.tags[key] = [tag_name, total]
+            bisect.insort(self.keys, key)
+
+    def remove_tag(self, tag_name):
+        key = tag_name.lower()
+        with self.lock:
+            if self.tags.pop(key, None) is not None:
+                del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def change_total(self, tag_name, delta):
+        with self.lock:
+            entry = self.tags.get(tag_name.lower())
+            if entry is not None:
+                entry[1] = max(entry[1] + delta, 0)
+
+    def complete(self, prefix, amount=SUGGESTIONS_AMOUNT):
+        """Tags starting with prefix, case-insensitively, the most used first"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        self.ensure_loaded()
+        with self.lock:
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+            keys = self.keys[start:end]
+            entries = [self.tags[key] for key in keys]
+
+        best = heapq.nsmallest(amount, entries, key=lambda entry: (-entry[1], entry[0]))
+        return [{'tag_name': tag_name, 'total': total} for tag_name, total in best]
+
+
+tag_index = TagIndex()
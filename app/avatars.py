@@ -0,0 +1,61 @@
+"""Fixed-size avatar thumbnails, stored next to the uploaded original.
+
+Thumbnail names are derived from the original name, so resolving a thumbnail url
+needs nothing but Profile.avatar.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+THUMBNAIL_EXTENSIONS = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+
+def get_thumbnail_name(avatar_name, size):
+    stem, _ = os.path.splitext(avatar_name)
+    return f'{stem}.{size}.{THUMBNAIL_EXTENSIONS[settings.AVATAR_THUMBNAIL_FORMAT]}'
+
+
+def get_thumbnail_url(avatar_name, size):
+    if not avatar_name:
+        return None
+    return default_storage.url(get_thumbnail_name(avatar_name, size))
+
+
+def get_avatar_thumbnails(avatar_name):
+    """Urls of the card sized thumbnail and of its double size for high density screens"""
+    if not avatar_name:
+        return None
+    return {
+        'url': get_thumbnail_url(avatar_name, settings.AVATAR_SIZE),
+        'url_2x': get_thumbnail_url(avatar_name, settings.AVATAR_SIZE * 2),
+    }
+
+
+def has_thumbnails(avatar_name):
+    return all(
+        default_storage.exists(get_thumbnail_name(avatar_name, size))
+        for size in settings.AVATAR_THUMBNAIL_SIZES
+    )
+
+
+def make_thumbnails(avatar):
+    with avatar.open('rb'):
+        image = ImageOps.exif_transpose(Image.open(avatar))
+        image.load()
+    image = image.convert('RGBA' if settings.AVATAR_THUMBNAIL_FORMAT == 'WEBP' else 'RGB')
+
+    for size in settings.AVATAR_THUMBNAIL_SIZES:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        content = io.BytesIO()
+        thumbnail.save(content, settings.AVATAR_THUMBNAIL_FORMAT, quality=settings.AVATAR_THUMBNAIL_QUALITY)
+
+        thumbnail_name = get_thumbnail_name(avatar.name, size)
+        default_storage.delete(thumbnail_name)
+        default_storage.save(thumbnail_name, ContentFile(content.getvalue()))
@@ -0,0 +1,128 @@
+"""Fragment cache of rendered question and answer cards.
+
+A card is cached under its object id and a version stamp, so nothing is ever purged:
+changed likes, answers or tags bump Question.card_version, edited answers bump
+Answer.card_version, changed avatar changes the avatar part of the stamp, and stale
+cards just expire.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+
+from app.models import Profile
+
+
+class CardsCacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.render_time = 0.0
+
+    def record(self, hits, misses, render_time):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.render_time += render_time
+
+    def aggregate(self):
+        with self.lock:
+            hits, misses, render_time = self.hits, self.misses, self.render_time
+
+        average_render_time = render_time / misses if misses else 0.0
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'average_render_ms': average_render_time * 1000,
+            'saved_ms': hits * average_render_time * 1000,
+        }
+
+
+def get_avatar_stamp(user):
+    profile = getattr(user, 'profile', None)
+    if profile is None or not profile.avatar:
+        return '-'
+    return hashlib.md5(profile.avatar.name.encode()).hexdigest()[:8]
+
+
+class CardsCache:
+    def __init__(self, prefix, template_name, context_name):
+        self.prefix = prefix
+        self.template_name = template_name
+        self.context_name = context_name
+        self.stats = CardsCacheStats()
+
+    def get_version(self, obj):
+        raise NotImplementedError
+
+    def load_data(self, objects):
+        raise NotImplementedError
+
+    def make_key(self, obj):
+        return f'card:{self.prefix}:{obj.pk}:{self.get_version(obj)}'
+
+    def render(self, objects):
+        """Return rendered cards of objects in their order, rendering only the cards missing in the cache"""
+        objects = list(objects)
+        cache = caches[settings.CARDS_CACHE]
+        keys = [self.make_key(obj) for obj in objects]
+        cached_cards = cache.get_many(keys)
+
+        missing = [obj for obj, key in zip(objects, keys) if key not in cached_cards]
+        start = time.perf_counter()
+        rendered_cards = {}
+        for item in self.load_data(missing):
+            obj = item[self.context_name]
+            rendered_cards[self.make_key(obj)] = render_to_string(self.template_name, {self.context_name: item})
+        render_time = time.perf_counter() - start
+
+        if rendered_cards:
+            cache.set_many(rendered_cards, settings.CARDS_CACHE_TIMEOUT)
+        self.stats.record(len(objects) - len(missing), len(missing), render_time)
+
+        cached_cards.update(rendered_cards)
+        return [cached_cards[key] for key in keys]
+
+
+class QuestionCardsCache(CardsCache):
+    def get_version(self, question):
+        return f'{question.card_version}:{get_avatar_stamp(question.author)}'
+
+    def load_data(self, questions):
+        prefetch_related_objects(questions, 'tag_set')
+        avatars = Profile.objects.get_users_avatars(question.author for question in questions)
+        return [
+            {
+                'question': question,
+                'tags': question.tag_set.all(),
+                'likes_counter': question.likes_count,
+                'answers_counter': question.answers_count,
+                'author_avatar': avatars[question.author_id]
+            }
+            for question in questions
+        ]
+
+
+class AnswerCardsCache(CardsCache):
+    def get_version(self, answer):
+        return f'{answer.card_version}:{get_avatar_stamp(answer.author)}'
+
+    def load_data(self, answers):
+        avatars = Profile.objects.get_users_avatars(answer.author for answer in answers)
+        return [
+            {
+                'answer': answer,
+                'author_avatar': avatars[answer.author_id]
+            }
+            for answer in answers
+        ]
+
+
+question_cards = QuestionCardsCache('question', 'include/question-card.html', 'question')
+answer_cards = AnswerCardsCache('answer', 'include/question-answer-card.html', 'answer')
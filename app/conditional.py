@@ -0,0 +1,61 @@
+import hashlib
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views import View
+
+
+class ConditionalGetView(View):
+    """View answering If-None-Match and If-Modified-Since with 304 before any rendering.
+
+    Subclasses return from get_validator the time of the last change of the page content
+    and any other values it depends on; None disables conditional handling.
+    """
+
+    def get_validator(self, request, *args, **kwargs):
+        return None
+
+    @staticmethod
+    def make_etag(request, last_modified, parts):
+        user_key = request.user.pk if request.user.is_authenticated else 'anonymous'
+        validator = ':'.join(str(part) for part in [user_key, last_modified.isoformat(), *parts])
+        return quote_etag(hashlib.md5(validator.encode()).hexdigest())
+
+    def check_conditions(self, request, *args, **kwargs):
+        """Return 304 response, if the client copy is fresh, and the validator headers of the page"""
+        validator = self.get_validator(request, *args, **kwargs)
+        if validator is None or validator[0] is None:
+            return None, None
+
+        last_modified, parts = validator
+        if timezone.is_naive(last_modified):
+            last_modified = timezone.make_aware(last_modified, timezone.utc)
+        headers = {'ETag': self.make_etag(request, last_modified, parts)}
+        # Last-Modified can not tell apart pages of different users, only anonymous pages get it
+        last_modified_timestamp = None
+        if not request.user.is_authenticated:
+            last_modified_timestamp = int(last_modified.timestamp())
+            headers['Last-Modified'] = http_date(last_modified_timestamp)
+
+        response = get_conditional_response(request, etag=headers['ETag'], last_modified=last_modified_timestamp)
+        return response, headers
+
+    @staticmethod
+    def add_validator_headers(response, headers):
+        if headers is None or response.status_code not in (200, 304):
+            return response
+
+        for header, value in headers.items():
+            response.headers.setdefault(header, value)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        response, headers = self.check_conditions(request, *args, **kwargs)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return self.add_validator_headers(response, headers)
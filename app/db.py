@@ -0,0 +1,49 @@
+"""SQLite connection tuning and the optional read replica router.
+
+Pragmas from SQLITE_PRAGMAS are applied to every new SQLite connection. With WAL readers
+and the writer do not block each other, so the read-only DATABASE_READ_ALIAS connection
+to the same file lets read queries proceed while another connection writes.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Pragmas changing the database file rather than the connection, skipped on read-only connections
+PERSISTENT_PRAGMAS = ('journal_mode',)
+
+
+def is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+def apply_pragmas(connection):
+    if connection.vendor != 'sqlite':
+        return
+
+    read_only = is_read_only(connection)
+    for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if read_only and pragma in PERSISTENT_PRAGMAS:
+            continue
+        # The raw connection is used, so that pragmas are not counted as queries of the request
+        connection.connection.execute(f'PRAGMA {pragma} = {value}')
+
+
+class ReadReplicaRouter:
+    """Send reads to DATABASE_READ_ALIAS and writes to the primary database.
+
+    Reads inside a transaction of the primary stay on it, otherwise they would miss
+    the transaction's own uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return settings.DATABASE_READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,81 @@
+import atexit
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+from app.models import LIKE_REPUTATION, HotSnapshot, Profile, Question
+from app.pagecache import page_cache
+
+
+def apply_likes_deltas(questions_deltas):
+    questions_deltas = {question_id: delta for question_id, delta in questions_deltas.items() if delta}
+    Question.objects.change_counters('likes_count', questions_deltas)
+    Profile.objects.change_authors_reputation({
+        question_id: delta * LIKE_REPUTATION for question_id, delta in questions_deltas.items()
+    })
+    for question_id, delta in questions_deltas.items():
+        HotSnapshot.objects.record_like(question_id, delta)
+    if questions_deltas:
+        page_cache.purge_questions(questions_deltas)
+
+
+class LikesCounter:
+    """Apply changes of questions likes counters, right away or coalesced.
+
+    With LIKES_BUFFERED the deltas are summed in memory and written with one UPDATE per
+    distinct delta after LIKES_FLUSH_INTERVAL seconds or LIKES_FLUSH_BATCH changes, so a
+    burst of likes on a popular question costs one counter write instead of one per like.
+    Deltas buffered by a crashed process are lost until recountquestions is run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deltas = Counter()
+        self.changes = 0
+        self.timer = None
+        self.exit_flush_registered = False
+
+    def add(self, question_id, delta):
+        if not settings.LIKES_BUFFERED:
+            apply_likes_deltas({question_id: delta})
+            return
+
+        with self.lock:
+            self.deltas[question_id] += delta
+            self.changes += 1
+            flush_now = self.changes >= settings.LIKES_FLUSH_BATCH
+            if not flush_now and self.timer is None:
+                self.timer = threading.Timer(settings.LIKES_FLUSH_INTERVAL, self.flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+            if not self.exit_flush_registered:
+                atexit.register(self.flush)
+                self.exit_flush_registered = True
+
+        if flush_now:
+            self.flush()
+
+    def pending(self, question_id):
+        with self.lock:
+            return self.deltas.get(question_id, 0)
+
+    def flush(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, Counter()
+            self.changes = 0
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        apply_likes_deltas(deltas)
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+
+likes_counter = LikesCounter()
@@ -0,0 +1,209 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+)
+from django.urls import reverse
+from django.utils.http import urlencode
+from app.models import Answer, Question, Tag
+
+from contextlib import contextmanager
+from pathlib import Path
+import io
+import json
+import logging
+import statistics
+import tempfile
+import time
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and query counts of every page on generated datasets and compare them with a baseline'
+
+    SCALES = '1000,100'
+    SEED = 1
+    REQUESTS = 20
+    TOLERANCE = 0.25
+    UNCACHED_PAGES_ALIAS = 'benchmark-uncached-pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=self.SCALES,
+                            help='Comma separated filldata --scale values to benchmark')
+        parser.add_argument('--seed', type=int, default=self.SEED)
+        parser.add_argument('--requests', type=int, default=self.REQUESTS,
+                            help='Amount of measured requests per route')
+        parser.add_argument('--output', default='benchmark.json', help='File to write the results to')
+        parser.add_argument('--baseline', default=None, help='Results of a previous run to compare with')
+        parser.add_argument('--tolerance', type=float, default=self.TOLERANCE,
+                            help='Allowed relative p95 latency growth against the baseline')
+
+    def fill_database(self, scale, seed):
+        call_command('flush', interactive=False, verbosity=0)
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            call_command(
+                'filldata',
+                scale=scale,
+                seed=seed,
+                workers=1,
+                checkpoint=str(Path(checkpoint_dir) / 'checkpoint.json'),
+                stdout=io.StringIO()
+            )
+        for cache in caches.all():
+            cache.clear()
+
+    def get_routes(self):
+        question = Question.objects.order_by('-answers_count').first()
+        oldest_question = Question.objects.order_by('time', 'id').first()
+        tag = Tag.objects.order_by('pk').first()
+        deep_page = max(Question.objects.count() // 5 - 1, 1)
+        answers_deep_page = max(Answer.objects.filter(question=question).count() // 5, 1)
+        oldest_cursor = f'{oldest_question.time},{oldest_question.pk}'
+
+        return {
+            'index': reverse('index-view'),
+            'index_deep_page': reverse('index-view') + f'?page={deep_page}',
+            'index_deep_cursor': reverse('index-view') + '?' + urlencode({'before': oldest_cursor}),
+            'hot': reverse('hot-view'),
+            'tag': reverse('tag-view', args=[tag.tag_name]),
+            'search': reverse('search-view') + f'?q={question.title.split()[0]}',
+            'question': reverse('question-view', args=[question.pk]),
+            'question_deep_page': reverse('question-view', args=[question.pk]) + f'?page={answers_deep_page}',
+        }
+
+    def measure_route(self, client, path, requests_amount):
+        client.get(path)
+
+        durations = []
+        queries = []
+        for _ in range(requests_amount):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(path)
+                durations.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{path} answered with {response.status_code}')
+            queries.append(len(context.captured_queries))
+
+        durations.sort()
+        return {
+            'path': path,
+            'p50_ms': round(statistics.median(durations), 3),
+            'p95_ms': round(durations[min(int(len(durations) * 0.95), len(durations) - 1)], 3),
+            'queries': max(queries),
+            'warm_p50_ms': self.measure_warm_route(client, path, requests_amount),
+            'cached_p50_ms': self.measure_cached_route(client, path, requests_amount),
+        }
+
+    @staticmethod
+    def measure_median(client, path, requests_amount):
+        client.get(path)
+
+        durations = []
+        for _ in range(requests_amount):
+            start = time.perf_counter()
+            client.get(path)
+            durations.append((time.perf_counter() - start) * 1000)
+        return round(statistics.median(durations), 3)
+
+    def measure_warm_route(self, client, path, requests_amount):
+        """Median latency of the page rendered with warm cards, top tags and best members caches"""
+        with override_settings(CACHES=self.warm_caches, PAGE_CACHE=self.UNCACHED_PAGES_ALIAS):
+            return self.measure_median(client, path, requests_amount)
+
+    def measure_cached_route(self, client, path, requests_amount):
+        """Median latency of the page served by the anonymous page cache, None for uncached routes"""
+        with override_settings(CACHES=self.warm_caches):
+            if client.get(path).get('X-Page-Cache') is None:
+                return None
+            return self.measure_median(client, path, requests_amount)
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for scale_name, routes in baseline.items():
+            for route_name, expected in routes.items():
+                measured = results.get(scale_name, {}).get(route_name)
+                if measured is None:
+                    continue
+
+                if measured['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+                    regressions.append(
+                        f"{scale_name} {route_name}: p95 {measured['p95_ms']}ms, baseline {expected['p95_ms']}ms"
+                    )
+                if measured['queries'] > expected['queries']:
+                    regressions.append(
+                        f"{scale_name} {route_name}: {measured['queries']} queries, baseline {expected['queries']}"
+                    )
+        return regressions
+
+    def run_benchmarks(self, options):
+        results = {}
+        client = Client()
+        for scale in [int(scale) for scale in options['scales'].split(',')]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'scale {scale}'))
+            self.fill_database(scale, options['seed'])
+
+            scale_results = {}
+            for route_name, path in self.get_routes().items():
+                scale_results[route_name] = self.measure_route(client, path, options['requests'])
+                route_result = scale_results[route_name]
+                cached = route_result['cached_p50_ms']
+                self.stdout.write(
+                    f"  {route_name:<20} p50 {route_result['p50_ms']:>9.3f}ms  "
+                    f"p95 {route_result['p95_ms']:>9.3f}ms  {route_result['queries']} queries  "
+                    f"warm p50 {route_result['warm_p50_ms']:.3f}ms"
+                    + (f"  cached p50 {cached:.3f}ms" if cached is not None else '')
+                )
+            results[f'scale_{scale}'] = scale_results
+        return results
+
+    @contextmanager
+    def benchmark_environment(self, test_database_name=None):
+        """Run on a throwaway test database, in memory unless test_database_name is given.
+
+        Every cache is replaced with a dummy one, so that measured requests render the pages,
+        cards, top tags and best members with their queries. Latencies with the real caches
+        are reported apart, as warm (page cache off) and cached (page cache on) medians.
+        """
+        dummy_cache = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        self.warm_caches = {**settings.CACHES, self.UNCACHED_PAGES_ALIAS: dummy_cache}
+        cold_caches = override_settings(CACHES={alias: dummy_cache for alias in self.warm_caches})
+        cold_caches.enable()
+        perf_logger = logging.getLogger('app.perf')
+        perf_logger_level = perf_logger.level
+        perf_logger.setLevel(logging.ERROR)
+        setup_test_environment()
+        old_database_name = connection.settings_dict['NAME']
+        old_test_database_name = connection.settings_dict['TEST'].get('NAME')
+        if test_database_name is not None:
+            connection.settings_dict['TEST']['NAME'] = test_database_name
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+            connection.settings_dict['TEST']['NAME'] = old_test_database_name
+            teardown_test_environment()
+            perf_logger.setLevel(perf_logger_level)
+            cold_caches.disable()
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline'] is not None:
+            baseline = json.loads(Path(options['baseline']).read_text())
+
+        with self.benchmark_environment():
+            results = self.run_benchmarks(options)
+
+        Path(options['output']).write_text(json.dumps(results, indent=4))
+        self.stdout.write(f"results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('performance regressions:\n' + '\n'.join(regressions))
+            self.stdout.write('no regressions against the baseline')
+        self.stdout.write(self.style.SUCCESS('SUCCESS'))
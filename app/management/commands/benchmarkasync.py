@@ -0,0 +1,88 @@
+from django.core.management.base import CommandError
+from django.test import AsyncClient
+from django.urls import Resolver404, NoReverseMatch, resolve, reverse
+from app.management.commands.benchmark import Command as BenchmarkCommand
+
+from pathlib import Path
+import asyncio
+import json
+import time
+
+
+class Command(BenchmarkCommand):
+    help = 'Compare throughput of the sync and async questions pages under concurrent requests'
+
+    SCALE = 1000
+    CONCURRENCY = 10
+    REQUESTS = 200
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=self.SCALE, help='filldata --scale of the dataset')
+        parser.add_argument('--seed', type=int, default=self.SEED)
+        parser.add_argument('--concurrency', type=int, default=self.CONCURRENCY,
+                            help='Amount of requests in flight at once')
+        parser.add_argument('--requests', type=int, default=self.REQUESTS,
+                            help='Amount of measured requests per route and path')
+        parser.add_argument('--output', default='benchmark-async.json', help='File to write the results to')
+
+    @staticmethod
+    def make_async_path(path):
+        path, _, query = path.partition('?')
+        try:
+            match = resolve(path)
+            async_path = reverse(f'async-{match.url_name}', args=match.args, kwargs=match.kwargs)
+        except (Resolver404, NoReverseMatch):
+            return None
+        return f'{async_path}?{query}' if query else async_path
+
+    async def measure_throughput(self, path, concurrency, requests_amount):
+        client = AsyncClient()
+        await client.get(path)
+
+        pending = iter(range(requests_amount))
+
+        async def send_requests():
+            for _ in pending:
+                response = await client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'{path} answered with {response.status_code}')
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send_requests() for _ in range(concurrency)))
+        return requests_amount / (time.perf_counter() - start)
+
+    def run_benchmarks(self, options):
+        self.fill_database(options['scale'], options['seed'])
+
+        results = {}
+        for route_name, path in self.get_routes().items():
+            async_path = self.make_async_path(path)
+            if async_path is None:
+                continue
+
+            sync_rps, async_rps = [
+                asyncio.run(self.measure_throughput(measured_path, options['concurrency'], options['requests']))
+                for measured_path in (path, async_path)
+            ]
+            results[route_name] = {
+                'sync_path': path,
+                'async_path': async_path,
+                'sync_rps': round(sync_rps, 1),
+                'async_rps': round(async_rps, 1),
+            }
+            self.stdout.write(
+                f'  {route_name:<20} sync {sync_rps:>8.1f} rps  async {async_rps:>8.1f} rps  '
+                f'x{async_rps / sync_rps:.2f}'
+            )
+        return results
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"scale {options['scale']}, {options['concurrency']} concurrent requests"
+        ))
+        with self.benchmark_environment():
+            results = self.run_benchmarks(options)
+
+        Path(options['output']).write_text(json.dumps(results, indent=4))
+        self.stdout.write(f"results written to {options['output']}")
+        self.stdout.write(self.style.SUCCESS('SUCCESS'))
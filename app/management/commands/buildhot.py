@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from app.models import HotSnapshot
+from app.views import HotQuestionsView
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hot questions snapshot served by the hot questions page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--likes-to-hot', type=int, default=HotQuestionsView.LIKES_TO_HOT)
+
+    def handle(self, *args, **options):
+        snapshot = HotSnapshot.objects.build(options['likes_to_hot'])
+        self.stdout.write(self.style.SUCCESS(
+            f'SUCCESS: {snapshot.entries.count()} hot questions ranked in {snapshot.build_duration}'
+        ))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from app.assets import available_encodings, write_encoded_manifest, write_encoded_variants
+
+
+class Command(BaseCommand):
+    help = 'Collect static files under fingerprinted names and write their precompressed variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Remove previously collected files first')
+
+    def handle(self, *args, **options):
+        if not isinstance(staticfiles_storage, ManifestFilesMixin):
+            raise CommandError('STATICFILES_STORAGE has to keep a manifest of fingerprinted names')
+
+        call_command('collectstatic', interactive=False, clear=options['clear'], verbosity=0)
+
+        files = {}
+        for original_name, hashed_name in staticfiles_storage.load_manifest().items():
+            files[hashed_name] = {
+                'immutable': True,
+                'encodings': write_encoded_variants(settings.STATIC_ROOT, hashed_name),
+            }
+            files[original_name] = {
+                'immutable': False,
+                'encodings': write_encoded_variants(settings.STATIC_ROOT, original_name),
+            }
+        write_encoded_manifest(settings.STATIC_ROOT, files)
+
+        encoded = sum(1 for entry in files.values() if entry['encodings'])
+        self.stdout.write(self.style.SUCCESS(
+            f"SUCCESS: {len(files)} files, {encoded} precompressed with {', '.join(available_encodings())}"
+        ))
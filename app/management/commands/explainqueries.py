@@ -0,0 +1,116 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from app.models import HotSnapshot, Profile, Question, Tag
+
+INDEX_SCAN_RE = re.compile(r'^SCAN \S+ USING (?:COVERING )?INDEX (\S+)')
+
+# Indexes the pages read rows in the order of, a scan of them under a LIMIT stops early
+ORDERED_INDEXES = (
+    (Question, ['time', 'id']),
+    (Question, ['likes_count', 'time', 'id']),
+    (Question, ['changed_at']),
+    (HotSnapshot, ['built_at']),
+    (Profile, ['reputation', 'id']),
+)
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN QUERY PLAN of every query issued by the questions pages and report table scans, ' \
+           'unbounded index scans and temporary B-tree sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error when any query scans a whole table or index or sorts its rows')
+
+    def get_sample_paths(self):
+        question = Question.objects.order_by('-answers_count').first()
+        tag = Tag.objects.order_by('pk').first()
+        if question is None or tag is None:
+            raise CommandError('The database is empty, fill it with filldata first')
+
+        return [
+            reverse('index-view'),
+            reverse('index-view') + '?page=100',
+            reverse('hot-view'),
+            reverse('tag-view', args=[tag.tag_name]),
+            reverse('search-view') + f'?q={question.title.split()[0]}',
+            reverse('question-view', args=[question.pk]),
+            reverse('question-view', args=[question.pk]) + '?page=2',
+        ]
+
+    def capture_queries(self, path):
+        request = RequestFactory().get(path)
+        # Views are called without the middleware, which would set the user
+        request.user = AnonymousUser()
+        match = resolve(request.path_info)
+        with CaptureQueriesContext(connection) as context:
+            match.func(request, *match.args, **match.kwargs)
+        return [query['sql'] for query in context.captured_queries]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    @staticmethod
+    def get_ordered_index_names():
+        names = set()
+        with connection.cursor() as cursor:
+            for model, fields in ORDERED_INDEXES:
+                columns = [model._meta.get_field(field).column for field in fields]
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                names.update(name for name, constraint in constraints.items()
+                             if constraint['index'] and constraint['columns'] == columns)
+        return names
+
+    @staticmethod
+    def get_problem(sql, plan, plan_row, ordered_indexes):
+        """Kind of the problem the plan row shows, None if the row is fine"""
+        if plan_row.startswith('USE TEMP B-TREE'):
+            return 'sort'
+        if not plan_row.startswith('SCAN ') or ' VIRTUAL TABLE INDEX ' in plan_row:
+            return None
+
+        match = INDEX_SCAN_RE.match(plan_row)
+        if match is None:
+            return 'table scan'
+        # A scan in the order of the index stops after LIMIT rows, any sort of the rows reads them all
+        bounded = ' LIMIT ' in sql and not any(row.startswith('USE TEMP B-TREE') for row in plan)
+        if match.group(1) in ordered_indexes and bounded:
+            return None
+        return 'index scan'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN report is implemented for SQLite only')
+
+        ordered_indexes = self.get_ordered_index_names()
+        problems = {'table scan': 0, 'index scan': 0, 'sort': 0}
+        for path in self.get_sample_paths():
+            Tag.objects.invalidate_top_tags()
+            self.stdout.write(self.style.MIGRATE_HEADING(path))
+            for sql in self.capture_queries(path):
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+
+                self.stdout.write(f'  {sql}')
+                plan = self.explain(sql)
+                for plan_row in plan:
+                    problem = self.get_problem(sql, plan, plan_row, ordered_indexes)
+                    if problem is not None:
+                        problems[problem] += 1
+                        self.stdout.write(self.style.WARNING(f'    {plan_row}'))
+                    else:
+                        self.stdout.write(f'    {plan_row}')
+
+        report = f"{problems['table scan']} table scans, {problems['index scan']} unbounded index scans " \
+                 f"and {problems['sort']} temporary B-tree sorts found"
+        if any(problems.values()) and options['fail_on_scan']:
+            raise CommandError(report)
+        self.stdout.write(self.style.SUCCESS(f'SUCCESS: {report}'))
@@ -1,175 +1,313 @@
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
 from app.models import Profile, Question, Answer, Like, Tag
+from app.search import drop_sync_triggers, create_sync_triggers, rebuild_search_index
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from django.utils.timezone import timezone
+from django.utils import timezone
 
-import requests
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+import itertools
+import json
+import os
 import random
 import datetime
 
+WORDS_CORPUS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore '
+    'et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip '
+    'ex ea commodo consequat duis aute irure in reprehenderit voluptate velit esse cillum eu fugiat '
+    'nulla pariatur excepteur sint occaecat cupidatat non proident sunt culpa qui officia deserunt '
+    'mollit anim id est laborum curabitur pretium tincidunt lacus nulla gravida orci a odio nullam '
+    'varius turpis et commodo pharetra eros bibendum elit nec luctus magna felis sollicitudin mauris '
+    'integer in mauris eu nibh euismod gravida duis ac tellus et risus vulputate vehicula donec lobortis '
+    'risus a elit etiam tempor ut ullamcorper ligula eu tempor congue eros est euismod turpis id '
+    'tincidunt sapien risus a quam maecenas fermentum consequat mi donec fermentum pellentesque '
+    'malesuada nulla a mi duis sapien sem aliquet nec commodo eget consequat quis neque aliquam '
+    'faucibus elit ut dictum aliquet felis nisl adipiscing sapien sed malesuada diam lacus eget erat'
+).split()
+FIRST_NAMES = (
+    'Anna', 'Boris', 'Daria', 'Egor', 'Elena', 'Fedor', 'Galina', 'Igor', 'Irina', 'Kirill',
+    'Ksenia', 'Lev', 'Maria', 'Nikita', 'Olga', 'Pavel', 'Polina', 'Roman', 'Sofia', 'Timur',
+)
+LAST_NAMES = (
+    'Ivanov', 'Petrova', 'Smirnov', 'Kuznetsova', 'Popov', 'Vasilieva', 'Sokolov', 'Mikhailova',
+    'Novikov', 'Fedorova', 'Morozov', 'Volkova', 'Alekseev', 'Lebedeva', 'Semenov', 'Egorova',
+)
+
+TITLE_LEN = 10
+MIN_TEXT_LEN = 20
+MAX_TEXT_LEN = 100
+MAX_TAGS = 5
+CORRECT_ANSWER_PROBABILITY = 0.2
+QUESTIONS_TIME_SPREAD = datetime.timedelta(days=365)
+
+
+def create_text_by_word_length(rng, length):
+    return ' '.join(rng.choices(WORDS_CORPUS, k=length))
+
+
+def generate_shard(task):
+    """Generate rows of one shard of questions with their answers, tag links and likes.
+
+    Runs in a worker process, so it only returns plain tuples and never touches the database.
+    """
+    rng = random.Random(f"{task['seed']}:{task['shard']}")
+    started_at = datetime.datetime.fromisoformat(task['started_at'])
+    spread_seconds = int(QUESTIONS_TIME_SPREAD.total_seconds())
+    user_ids = range(task['first_user_id'], task['last_user_id'] + 1)
+    tag_ids = range(task['first_tag_id'], task['last_tag_id'] + 1)
+
+    questions, answers, links, likes = [], [], [], []
+    for question_id in range(task['first_question_id'], task['last_question_id'] + 1):
+        question_time = started_at - datetime.timedelta(seconds=rng.randint(0, spread_seconds))
+        questions.append((
+            question_id,
+            create_text_by_word_length(rng, TITLE_LEN),
+            create_text_by_word_length(rng, rng.randint(MIN_TEXT_LEN, MAX_TEXT_LEN)),
+            question_time,
+            rng.choice(user_ids)
+        ))
+
+        for _ in range(rng.randint(0, round(2 * task['answers_per_question']))):
+            answers.append((
+                create_text_by_word_length(rng, rng.randint(MIN_TEXT_LEN, MAX_TEXT_LEN)),
+                rng.random() < CORRECT_ANSWER_PROBABILITY,
+                min(question_time + datetime.timedelta(seconds=rng.randint(0, spread_seconds // 12)), started_at),
+                question_id,
+                rng.choice(user_ids)
+            ))
+
+        if tag_ids:
+            for tag_id in rng.sample(tag_ids, min(rng.randint(1, MAX_TAGS), len(tag_ids))):
+                links.append((tag_id, question_id))
+
+        likes_amount = min(rng.randint(0, round(2 * task['likes_per_question'])), len(user_ids))
+        for user_id in rng.sample(user_ids, likes_amount):
+            likes.append((user_id, question_id))
+
+    return {'shard': task['shard'], 'questions': questions, 'answers': answers, 'links': links, 'likes': likes}
+
 
 class Command(BaseCommand):
-    RANDOM_API_KEY = '78c7df1074544d209e549dc135589056'
-    RANDOM_TEXT_API = 'https://randommer.io/api/Text/LoremIpsum'
-    RANDOM_NAME_API = 'https://randommer.io/api/Name'
-    PARAGRAPHS_AMOUNT = 1
+    help = 'Fill the database with generated users, questions, answers, tags and likes'
+
+    USERS_PASSWORD = 'password'
 
     SCALE = 1000
-    USERS_NEEDS = 10000 // SCALE
-    QUESTIONS_NEEDS = 100000 // SCALE
-    ANSWERS_NEEDS = 1000000 // SCALE
-    TAGS_NEEDS = 20000 * QUESTIONS_NEEDS // SCALE
-    LIKES_NEEDS = 2000000 // SCALE
-
-    TITLE_LEN = 10
-    MIN_TEXT_LEN = 20
-    MAX_TEXT_LEN = 100
-    MAX_ANSWERS = 5
-    MAX_TAGS = 5
-    MAX_LIKES = 40
-
-    def __init__(self):
-        super().__init__()
-        self.text_dataset = self.generate_words_dataset()
-        self.names_set = self.generate_names_set()
-
-    def generate_words_dataset(self):
-        params = {'loremType': 'normal', 'type': 'paragraphs', 'number': self.PARAGRAPHS_AMOUNT}
-        r = requests.get(
-            self.RANDOM_TEXT_API,
-            params=params,
-            headers={'X-Api-Key': self.RANDOM_API_KEY}
-        )
-        return r.text.split()
-
-    def generate_names_set(self):
-        params = {'nameType': 'fullname', 'quantity': 100}
-        r = requests.get(
-            self.RANDOM_NAME_API,
-            params=params,
-            headers={'X-Api-Key': self.RANDOM_API_KEY}
-        )
-        return r.json()
-
-    def create_text_by_word_length(self, len):
-        result_string = str()
-        for i in range(len):
-            result_string = result_string + random.choice(self.text_dataset) + ' '
-        return result_string
-
-    def create_users_and_ref_profiles(self):
+    USERS = 10000
+    QUESTIONS = 100000
+    ANSWERS = 1000000
+    TAGS = 10000
+    LIKES = 2000000
+
+    BATCH_SIZE = 5000
+    SHARD_SIZE = 1000
+    CHECKPOINT = 'filldata.checkpoint.json'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.random = random.Random()
+        self.batch_size = self.BATCH_SIZE
+        self.checkpoint_path = None
+        self.checkpoint = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=self.SCALE,
+                            help='Divide the full dataset size by this number, 1 generates everything')
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the data generator')
+        parser.add_argument('--batch-size', type=int, default=self.BATCH_SIZE,
+                            help='Amount of rows inserted by one query')
+        parser.add_argument('--shard-size', type=int, default=self.SHARD_SIZE,
+                            help='Amount of questions generated by one worker task')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Amount of generating processes')
+        parser.add_argument('--checkpoint', default=self.CHECKPOINT,
+                            help='File recording completed shards, an interrupted run resumes from it')
+
+    def save_checkpoint(self):
+        tmp_path = self.checkpoint_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.checkpoint))
+        tmp_path.replace(self.checkpoint_path)
+
+    def load_checkpoint(self, options):
+        if not self.checkpoint_path.exists():
+            return None
+
+        checkpoint = json.loads(self.checkpoint_path.read_text())
+        if checkpoint['scale'] != options['scale'] or \
+                (options['seed'] is not None and checkpoint['seed'] != options['seed']):
+            raise CommandError(
+                f'{self.checkpoint_path} belongs to a run with other --scale or --seed, remove it to start over'
+            )
+        return checkpoint
+
+    def insert_in_batches(self, label, manager, objects, total=None):
+        inserted = 0
+        objects = iter(objects)
+        while batch := list(itertools.islice(objects, self.batch_size)):
+            manager.bulk_create(batch, batch_size=self.batch_size)
+            inserted += len(batch)
+            progress = f'{inserted}/{total}' if total is not None else f'{inserted}'
+            self.stdout.write(f'{label}: {progress}')
+        return inserted
+
+    @staticmethod
+    def last_id(model):
+        return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    def create_users_and_ref_profiles(self, users_needs):
+        password = make_password(self.USERS_PASSWORD)
+        now = timezone.now()
+        last_user_id = self.last_id(User)
+
         def create_user(user_counter):
-            name_choice = f'{random.choice(self.names_set)}{user_counter}'
-            name_split = name_choice.split()
-            pwd = f'{random.choice(self.text_dataset)}{random.choice(self.text_dataset)}{random.choice(self.text_dataset)}'
-            user_dict_repr = {
-                'username': name_choice,
-                'first_name': name_split[0],
-                'last_name': name_split[1],
-                'password': pwd,
-                'email': f'{random.choice(self.text_dataset)}@domen.mail',
-                'is_staff': False,
-                'is_active': True,
-                'is_superuser': False,
-                'last_login': datetime.datetime.now(tz=timezone.utc),
-                'date_joined': datetime.date.today()
-            }
-            return user_dict_repr
-
-        users_set = []
-        profiles_set = []
-        for i in range(self.USERS_NEEDS):
-            user = User(**create_user(i))
-            user.save()
-            users_set.append(user)
-            profile = Profile(user=user)
-            profiles_set.append(profile)
-
-        Profile.objects.bulk_create(profiles_set)
-
-    def create_questions(self, users):
-        def create_question(user):
-            question_fields = {
-                'title': self.create_text_by_word_length(self.TITLE_LEN),
-                'text': self.create_text_by_word_length(random.randint(self.MIN_TEXT_LEN, self.MAX_TEXT_LEN)),
-                'time': datetime.datetime.now(tz=timezone.utc),
-                'author': user
-            }
-            return question_fields
-
-        questions_set = []
-        for i in range(self.QUESTIONS_NEEDS):
-            question = Question(**create_question(random.choice(users)))
-            questions_set.append(question)
-
-        Question.objects.bulk_create(questions_set)
-
-    def create_answers(self, users, questions):
-        def create_answer(user, question):
-            answer_fields = {
-                'text': self.create_text_by_word_length(random.randint(self.MIN_TEXT_LEN, self.MAX_TEXT_LEN)),
-                'correct': random.choice([True, False]),
-                'time': datetime.datetime.now(tz=timezone.utc),
-                'question': question,
-                'author': user
-            }
-            return answer_fields
-
-        answers_created_indicate = self.ANSWERS_NEEDS
-        answers_set = []
-        while answers_created_indicate > 0:
-            one_question_answers_count = random.randint(0, self.MAX_ANSWERS)
-            answers_created_indicate -= one_question_answers_count
-            question = random.choice(questions)
-            for i in range(one_question_answers_count):
-                answer = Answer(**create_answer(random.choice(users), question))
-                answers_set.append(answer)
-
-        Answer.objects.bulk_create(answers_set)
-
-    def create_tags(self, questions):
-        questions = questions
-        tag = Tag(tag_name=random.choice(self.text_dataset))
-        tag.save()
-        tag.question.add(random.choice(questions))
-        for i in range(self.TAGS_NEEDS):
-            type_insertion = random.choice([0, 1])
-            if type_insertion == 1:
-                tags = Tag.objects.all()
-                choiced = random.choice(tags)
-                choiced.question.add(random.choice(questions))
-                choiced.save()
-            if type_insertion == 0:
-                tag = Tag(tag_name=random.choice(self.text_dataset))
-                tag.save()
-                tag.question.add(random.choice(questions))
-
-    def create_likes(self, users, questions):
-        def create_like(user, question):
-            like_fields = {
-                'user': user,
-                'question': question
+            first_name = self.random.choice(FIRST_NAMES)
+            last_name = self.random.choice(LAST_NAMES)
+            return User(
+                id=last_user_id + user_counter,
+                username=f'{first_name}{last_name}{last_user_id + user_counter}',
+                first_name=first_name,
+                last_name=last_name,
+                password=password,
+                email=f'{first_name.lower()}{last_user_id + user_counter}@domen.mail',
+                last_login=now,
+                date_joined=now
+            )
+
+        with transaction.atomic():
+            users = (create_user(i) for i in range(1, users_needs + 1))
+            self.insert_in_batches('users', User.objects, users, users_needs)
+            profiles = (Profile(user_id=last_user_id + i) for i in range(1, users_needs + 1))
+            self.insert_in_batches('profiles', Profile.objects, profiles, users_needs)
+        return last_user_id + 1, last_user_id + users_needs
+
+    def create_tags(self, tags_needs):
+        existing_names = set(Tag.objects.values_list('tag_name', flat=True))
+        last_tag_id = self.last_id(Tag)
+
+        def create_tag_names():
+            for counter in itertools.count():
+                tag_name = f'{self.random.choice(WORDS_CORPUS)}{counter}'
+                if tag_name not in existing_names:
+                    yield tag_name
+
+        tag_names = itertools.islice(create_tag_names(), tags_needs)
+        with transaction.atomic():
+            tags = (Tag(id=last_tag_id + i, tag_name=tag_name) for i, tag_name in enumerate(tag_names, start=1))
+            self.insert_in_batches('tags', Tag.objects, tags, tags_needs)
+        return last_tag_id + 1, last_tag_id + tags_needs
+
+    def start_run(self, options):
+        scale = max(options['scale'], 1)
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        self.random.seed(seed)
+
+        first_user_id, last_user_id = self.create_users_and_ref_profiles(max(self.USERS // scale, 1))
+        first_tag_id, last_tag_id = self.create_tags(self.TAGS // scale)
+        questions_needs = self.QUESTIONS // scale
+        return {
+            'scale': options['scale'],
+            'seed': seed,
+            'started_at': timezone.now().isoformat(),
+            'first_user_id': first_user_id,
+            'last_user_id': last_user_id,
+            'first_tag_id': first_tag_id,
+            'last_tag_id': last_tag_id,
+            'first_question_id': self.last_id(Question) + 1,
+            'questions_needs': questions_needs,
+            'shard_size': max(options['shard_size'], 1),
+            'answers_per_question': self.ANSWERS // scale / questions_needs if questions_needs else 0,
+            'likes_per_question': self.LIKES // scale / questions_needs if questions_needs else 0,
+            'completed_shards': []
+        }
+
+    def make_shard_tasks(self):
+        checkpoint = self.checkpoint
+        shard_size = checkpoint['shard_size']
+        completed = set(checkpoint['completed_shards'])
+        shards_amount = (checkpoint['questions_needs'] + shard_size - 1) // shard_size
+        for shard in range(shards_amount):
+            if shard in completed:
+                continue
+
+            first_question_id = checkpoint['first_question_id'] + shard * shard_size
+            last_question_id = min(
+                first_question_id + shard_size,
+                checkpoint['first_question_id'] + checkpoint['questions_needs']
+            ) - 1
+            yield {
+                'shard': shard,
+                'seed': checkpoint['seed'],
+                'started_at': checkpoint['started_at'],
+                'first_user_id': checkpoint['first_user_id'],
+                'last_user_id': checkpoint['last_user_id'],
+                'first_tag_id': checkpoint['first_tag_id'],
+                'last_tag_id': checkpoint['last_tag_id'],
+                'first_question_id': first_question_id,
+                'last_question_id': last_question_id,
+                'answers_per_question': checkpoint['answers_per_question'],
+                'likes_per_question': checkpoint['likes_per_question'],
             }
-            return like_fields
 
-        likes_created_indicate = self.LIKES_NEEDS
-        likes_set = []
-        while likes_created_indicate > 0:
-            one_question_like_amount = random.randint(0, self.MAX_LIKES)
-            likes_created_indicate -= one_question_like_amount
-            question = random.choice(questions)
-            for i in range(one_question_like_amount):
-                like = Like(**create_like(random.choice(users), question))
-                likes_set.append(like)
+    def write_shard(self, shard_rows):
+        TagQuestion = Tag.question.through
+        with transaction.atomic():
+            self.insert_in_batches('questions', Question.objects, (
+                Question(id=question_id, title=title, text=text, time=time, author_id=author_id)
+                for question_id, title, text, time, author_id in shard_rows['questions']
+            ))
+            self.insert_in_batches('answers', Answer.objects, (
+                Answer(text=text, correct=correct, time=time, question_id=question_id, author_id=author_id)
+                for text, correct, time, question_id, author_id in shard_rows['answers']
+            ))
+            self.insert_in_batches('tag links', TagQuestion.objects, (
+                TagQuestion(tag_id=tag_id, question_id=question_id)
+                for tag_id, question_id in shard_rows['links']
+            ))
+            self.insert_in_batches('likes', Like.objects, (
+                Like(user_id=user_id, question_id=question_id)
+                for user_id, question_id in shard_rows['likes']
+            ))
 
-        Like.objects.bulk_create(likes_set)
+        self.checkpoint['completed_shards'].append(shard_rows['shard'])
+        self.save_checkpoint()
+        self.stdout.write(f"shard {shard_rows['shard']} written")
+
+    def generate_shards(self, tasks, workers):
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for task in tasks:
+                pending.add(executor.submit(generate_shard, task))
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.write_shard(future.result())
+
+            for future in pending:
+                self.write_shard(future.result())
 
     def handle(self, *args, **options):
-        self.create_users_and_ref_profiles()
-        users = User.objects.all()
-        self.create_questions(users)
-        questions = Question.objects.all()
-        self.create_answers(users, questions)
-        self.create_tags(questions)
-        self.create_likes(users, questions)
+        self.batch_size = options['batch_size']
+        self.checkpoint_path = Path(options['checkpoint'])
+        self.checkpoint = self.load_checkpoint(options)
+        if self.checkpoint is None:
+            self.checkpoint = self.start_run(options)
+            self.save_checkpoint()
+        else:
+            self.stdout.write(f"resuming with {len(self.checkpoint['completed_shards'])} completed shards")
+
+        drop_sync_triggers()
+        self.generate_shards(self.make_shard_tasks(), max(options['workers'] or 1, 1))
+        self.stdout.write('rebuilding search index')
+        rebuild_search_index()
+        create_sync_triggers()
+
+        Tag.objects.invalidate_top_tags()
+        call_command('rebuildreputation', stdout=self.stdout)
+        call_command('buildhot', stdout=self.stdout)
+        self.checkpoint_path.unlink()
         self.stdout.write(self.style.SUCCESS('SUCCESS'))
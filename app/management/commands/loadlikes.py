@@ -0,0 +1,117 @@
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from app.likes import likes_counter
+from app.management.commands.benchmark import Command as BenchmarkCommand
+from app.models import Like, Question
+
+from pathlib import Path
+import json
+import random
+import tempfile
+import threading
+import time
+
+
+class Command(BenchmarkCommand):
+    help = 'Load the like endpoint with concurrent toggles on a few popular questions and report likes/sec'
+
+    SCALE = 1000
+    USERS = 40
+    QUESTIONS = 3
+    THREADS = 4
+    DURATION = 5.0
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=self.SCALE, help='filldata --scale of the dataset')
+        parser.add_argument('--seed', type=int, default=self.SEED)
+        parser.add_argument('--users', type=int, default=self.USERS, help='Amount of liking users')
+        parser.add_argument('--questions', type=int, default=self.QUESTIONS, help='Amount of liked questions')
+        parser.add_argument('--threads', type=int, default=self.THREADS, help='Amount of concurrent clients')
+        parser.add_argument('--duration', type=float, default=self.DURATION,
+                            help='Seconds of load per mode')
+        parser.add_argument('--output', default='loadlikes.json', help='File to write the results to')
+
+    def send_likes(self, users, paths, deadline, results, seed):
+        chooser = random.Random(seed)
+        clients = []
+        for user in users:
+            client = Client(HTTP_ACCEPT='application/json')
+            client.force_login(user)
+            clients.append(client)
+
+        sent = 0
+        try:
+            while time.monotonic() < deadline:
+                response = chooser.choice(clients).post(chooser.choice(paths))
+                if response.status_code != 200:
+                    raise RuntimeError(f'like endpoint answered with {response.status_code}')
+                sent += 1
+        finally:
+            connection.close()
+            results.append(sent)
+
+    def run_mode(self, options, users, question_ids):
+        paths = [reverse('like-view', args=[question_id]) for question_id in question_ids]
+        users_per_thread = [users[thread::options['threads']] for thread in range(options['threads'])]
+        results = []
+        deadline = time.monotonic() + options['duration']
+        threads = [
+            threading.Thread(
+                target=self.send_likes,
+                args=(thread_users, paths, deadline, results, options['seed'] + thread_number)
+            )
+            for thread_number, thread_users in enumerate(users_per_thread)
+        ]
+
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        likes_counter.flush()
+        elapsed = time.monotonic() - start
+
+        consistent = all(
+            Question.objects.get(pk=question_id).likes_count == Like.objects.filter(question_id=question_id).count()
+            for question_id in question_ids
+        )
+        return {
+            'likes': sum(results),
+            'likes_per_second': round(sum(results) / elapsed, 1),
+            'consistent_counters': consistent,
+        }
+
+    def run_benchmarks(self, options):
+        self.fill_database(options['scale'], options['seed'])
+        users = list(User.objects.order_by('pk')[:options['users']])
+        question_ids = list(
+            Question.objects.order_by('-likes_count').values_list('pk', flat=True)[:options['questions']]
+        )
+
+        results = {}
+        for mode, buffered in (('direct', False), ('buffered', True)):
+            with override_settings(LIKES_BUFFERED=buffered):
+                results[mode] = self.run_mode(options, users, question_ids)
+            self.stdout.write(
+                f"  {mode:<10} {results[mode]['likes']:>7} likes  {results[mode]['likes_per_second']:>8.1f} likes/sec  "
+                f"counters {'consistent' if results[mode]['consistent_counters'] else 'INCONSISTENT'}"
+            )
+        return results
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"scale {options['scale']}, {options['threads']} clients on {options['questions']} questions"
+        ))
+        with tempfile.TemporaryDirectory() as database_dir:
+            with self.benchmark_environment(str(Path(database_dir) / 'loadlikes.sqlite3')):
+                results = self.run_benchmarks(options)
+
+        Path(options['output']).write_text(json.dumps(results, indent=4))
+        self.stdout.write(f"results written to {options['output']}")
+        if not all(result['consistent_counters'] for result in results.values()):
+            raise CommandError('likes counters do not match likes')
+        self.stdout.write(self.style.SUCCESS('SUCCESS'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from app.avatars import has_thumbnails, make_thumbnails
+from app.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Make avatar thumbnails of profiles uploaded before thumbnails existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Remake thumbnails which already exist')
+
+    def handle(self, *args, **options):
+        made = 0
+        for profile in Profile.objects.exclude(avatar='').exclude(avatar__isnull=True).iterator():
+            if not options['force'] and has_thumbnails(profile.avatar.name):
+                continue
+
+            try:
+                make_thumbnails(profile.avatar)
+            except FileNotFoundError:
+                self.stdout.write(self.style.WARNING(f'{profile}: {profile.avatar.name} is missing'))
+                continue
+            made += 1
+        self.stdout.write(self.style.SUCCESS(f'SUCCESS: {made} avatars processed'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from app.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Recompute reputation of every user from answers, correct answers and likes received'
+
+    def handle(self, *args, **options):
+        updated = Profile.objects.recount_reputation()
+        Profile.objects.invalidate_best_members()
+        self.stdout.write(self.style.SUCCESS(f'SUCCESS: {updated} profiles recounted'))
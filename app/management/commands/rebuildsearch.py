@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from app.search import create_sync_triggers, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the questions full-text search index and restore its sync triggers'
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        create_sync_triggers()
+        self.stdout.write(self.style.SUCCESS('SUCCESS'))
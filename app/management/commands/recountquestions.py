@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from app.models import Question
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized likes and answers counters of every question'
+
+    def handle(self, *args, **options):
+        updated = Question.objects.recount_counters()
+        self.stdout.write(self.style.SUCCESS(f'SUCCESS: {updated} questions recounted'))
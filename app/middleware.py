@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import mimetypes
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from app.assets import ENCODINGS, read_encoded_manifest
+from app.pagecache import page_cache
+from app.perf import RequestStats, current_request_stats, views_stats
+
+logger = logging.getLogger('app.perf')
+
+
+class PerformanceMiddleware:
+    """Measure SQL, view and template time of every request.
+
+    The numbers are sent back in the Server-Timing header, logged as one JSON line and
+    aggregated per view for the /_perf/ page. Requests issuing more queries than
+    PERF_QUERY_BUDGET are logged as warnings. Queries are counted by the execute wrapper
+    installed on every connection, so both sync and async views are measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.query_budget = getattr(settings, 'PERF_QUERY_BUDGET', None)
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats.total_time = time.perf_counter() - start
+            current_request_stats.reset(token)
+
+        self.finish(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stats.total_time = time.perf_counter() - start
+            current_request_stats.reset(token)
+
+        self.finish(request, response, stats)
+        return response
+
+    def finish(self, request, response, stats):
+        response['Server-Timing'] = self.make_server_timing(stats)
+        self.report(request, response, stats)
+
+    @staticmethod
+    def make_server_timing(stats):
+        return ', '.join([
+            f'sql;dur={stats.sql_time * 1000:.2f};desc="{stats.queries} queries"',
+            f'view;dur={stats.view_time * 1000:.2f}',
+            f'tpl;dur={stats.template_time * 1000:.2f}',
+            f'total;dur={stats.total_time * 1000:.2f}',
+        ])
+
+    def report(self, request, response, stats):
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        over_budget = self.query_budget is not None and stats.queries > self.query_budget
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'view_ms': round(stats.view_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+            'total_ms': round(stats.total_time * 1000, 2),
+            'over_query_budget': over_budget,
+        }
+        if over_budget:
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+        if view_name is not None:
+            views_stats.record(view_name, stats)
+
+
+class StaticFilesMiddleware:
+    """Serve files collected by buildstatic before any other middleware and view runs.
+
+    Fingerprinted names are cached by clients forever, original names only briefly. The
+    smallest precompressed variant accepted by the client is sent. Without a buildstatic
+    manifest in STATIC_ROOT the middleware is not used and static files are left to Django.
+    """
+    sync_capable = True
+    async_capable = True
+
+    IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+    MUTABLE_CACHE_CONTROL = 'public, max-age=60'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        files = read_encoded_manifest(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+        if not files:
+            raise MiddlewareNotUsed
+
+        self.root = Path(settings.STATIC_ROOT)
+        self.files = {settings.STATIC_URL + name: (name, entry) for name, entry in files.items()}
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        static_file = self.files.get(request.path_info)
+        if static_file is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+
+        response = self.serve(request, *static_file)
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.respond_async(response)
+        return response
+
+    @staticmethod
+    def get_encodings_quality(request):
+        qualities = {}
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            encoding, _, params = item.partition(';')
+            encoding = encoding.strip().lower()
+            if not encoding:
+                continue
+            quality = params.strip().replace(' ', '')
+            try:
+                qualities[encoding] = float(quality[2:]) if quality.startswith('q=') else 1.0
+            except ValueError:
+                # A malformed q-value does not accept the encoding
+                qualities[encoding] = 0.0
+        return qualities
+
+    @staticmethod
+    def is_accepted(qualities, encoding):
+        """Whether the encoding is accepted, by its own name or by '*' when it is not listed"""
+        return qualities.get(encoding, qualities.get('*', 0.0)) > 0
+
+    def serve(self, request, name, entry):
+        path = self.root / name
+        content_type, _ = mimetypes.guess_type(name)
+        qualities = self.get_encodings_quality(request)
+        encoding = next(
+            (
+                encoding for encoding in ENCODINGS
+                if encoding in entry['encodings'] and self.is_accepted(qualities, encoding)
+            ),
+            None
+        )
+        if encoding is not None:
+            path = path.with_name(path.name + ENCODINGS[encoding])
+
+        response = HttpResponse(
+            path.read_bytes() if request.method == 'GET' else b'',
+            content_type=content_type or 'application/octet-stream'
+        )
+        if request.method == 'HEAD':
+            response['Content-Length'] = path.stat().st_size
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        if entry['encodings']:
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = self.IMMUTABLE_CACHE_CONTROL if entry['immutable'] else self.MUTABLE_CACHE_CONTROL
+        return response
+
+    @staticmethod
+    async def respond_async(response):
+        return response
+
+
+class PageCacheMiddleware:
+    """Serve the questions pages of anonymous readers from app.pagecache.page_cache.
+
+    Requests with a session cookie are passed through without looking at the session, so
+    authenticated users always get freshly rendered pages. The X-Page-Cache header tells
+    whether the page came from the cache.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        key = page_cache.get_request_key(request)
+        if key is None:
+            return self.get_response(request)
+
+        response = page_cache.get(request, key)
+        if response is None:
+            response = self.get_response(request)
+            page_cache.store(key, response)
+        return response
+
+    async def __acall__(self, request):
+        key = page_cache.get_request_key(request)
+        if key is None:
+            return await self.get_response(request)
+
+        response = page_cache.get(request, key)
+        if response is None:
+            response = await self.get_response(request)
+            page_cache.store(key, response)
+        return response
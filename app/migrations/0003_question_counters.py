@@ -0,0 +1,44 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:26
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Question = apps.get_model('app', 'Question')
+    Answer = apps.get_model('app', 'Answer')
+    Like = apps.get_model('app', 'Like')
+
+    def total_of(model):
+        return model.objects \
+            .filter(question=models.OuterRef('pk')) \
+            .order_by() \
+            .values('question') \
+            .annotate(total=models.Count('pk')) \
+            .values('total')
+
+    Question.objects.update(
+        likes_count=Coalesce(models.Subquery(total_of(Like)), 0),
+        answers_count=Coalesce(models.Subquery(total_of(Answer)), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_remove_tag_question_tag_question'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
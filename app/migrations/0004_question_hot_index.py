@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_question_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-likes_count', '-time', '-id'], name='question_hot_idx'),
+        ),
+    ]
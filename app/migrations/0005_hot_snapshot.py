@@ -0,0 +1,37 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_question_hot_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('built_at', models.DateTimeField()),
+                ('build_duration', models.DurationField()),
+                ('likes_to_hot', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HotSnapshotEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField()),
+                ('rank', models.PositiveIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.question')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='app.hotsnapshot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='hotsnapshotentry',
+            index=models.Index(fields=['snapshot', '-score', 'rank'], name='hot_snapshot_rank_idx'),
+        ),
+    ]
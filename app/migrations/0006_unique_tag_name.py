@@ -0,0 +1,51 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:28
+
+from django.db import migrations, models
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    Tag = apps.get_model('app', 'Tag')
+    TagQuestion = Tag.question.through
+
+    duplicated_names = Tag.objects \
+        .values('tag_name') \
+        .annotate(total=models.Count('pk'), survivor_id=models.Min('pk')) \
+        .filter(total__gt=1)
+
+    for duplicated in duplicated_names:
+        survivor_id = duplicated['survivor_id']
+        duplicates = Tag.objects \
+            .filter(tag_name=duplicated['tag_name']) \
+            .exclude(pk=survivor_id)
+
+        survivor_questions = TagQuestion.objects \
+            .filter(tag_id=survivor_id) \
+            .values('question_id')
+        TagQuestion.objects \
+            .filter(tag__in=duplicates, question_id__in=survivor_questions) \
+            .delete()
+
+        moving_links = TagQuestion.objects \
+            .filter(tag__in=duplicates) \
+            .values_list('question_id', flat=True) \
+            .distinct()
+        TagQuestion.objects.bulk_create(
+            TagQuestion(tag_id=survivor_id, question_id=question_id) for question_id in moving_links
+        )
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_hot_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='tag_name',
+            field=models.CharField(max_length=20, unique=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_unique_tag_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:35
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    Like = apps.get_model('app', 'Like')
+    Question = apps.get_model('app', 'Question')
+
+    duplicated_likes = list(
+        Like.objects
+            .values('user', 'question')
+            .annotate(total=models.Count('pk'), survivor_id=models.Min('pk'))
+            .filter(total__gt=1)
+    )
+    if not duplicated_likes:
+        return
+
+    affected_questions = set()
+    for duplicated in duplicated_likes:
+        Like.objects \
+            .filter(user_id=duplicated['user'], question_id=duplicated['question']) \
+            .exclude(pk=duplicated['survivor_id']) \
+            .delete()
+        affected_questions.add(duplicated['question'])
+
+    likes_total = Like.objects \
+        .filter(question=models.OuterRef('pk')) \
+        .order_by() \
+        .values('question') \
+        .annotate(total=models.Count('pk')) \
+        .values('total')
+    Question.objects \
+        .filter(pk__in=affected_questions) \
+        .update(likes_count=Coalesce(models.Subquery(likes_total), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_question_time_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'time', 'id'], name='answer_question_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-time', '-id'], name='question_new_idx'),
+        ),
+        migrations.AlterField(
+            model_name='hotsnapshot',
+            name='built_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='like_user_question_unique'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:37
+
+import app.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_search_index(apps, schema_editor):
+    app.search.execute_statements(app.search.CREATE_SEARCH_TABLE, schema_editor.connection)
+    app.search.create_sync_triggers(schema_editor.connection)
+    app.search.rebuild_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    app.search.drop_sync_triggers(schema_editor.connection)
+    app.search.execute_statements(app.search.DROP_SEARCH_TABLE, schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSearch',
+            fields=[
+                ('question', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='app.question')),
+                ('title', models.TextField()),
+                ('text', models.TextField()),
+                ('document', app.search.SearchDocumentField(db_column='app_question_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'app_question_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
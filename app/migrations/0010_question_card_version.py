@@ -0,0 +1,24 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:40
+
+import app.search
+from django.db import migrations, models
+
+
+def recreate_search_triggers(apps, schema_editor):
+    app.search.create_sync_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_question_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='card_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:43
+
+import app.search
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def recreate_search_triggers(apps, schema_editor):
+    app.search.create_sync_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_question_card_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='changed_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
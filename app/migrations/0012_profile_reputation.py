@@ -0,0 +1,52 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:53
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+LIKE_REPUTATION = 1
+ANSWER_REPUTATION = 2
+CORRECT_ANSWER_REPUTATION = 10
+
+
+def fill_reputation(apps, schema_editor):
+    Profile = apps.get_model('app', 'Profile')
+    Answer = apps.get_model('app', 'Answer')
+    Like = apps.get_model('app', 'Like')
+
+    likes_received = Like.objects \
+        .filter(question__author=models.OuterRef('user')) \
+        .order_by() \
+        .values('question__author') \
+        .annotate(total=models.Count('pk')) \
+        .values('total')
+    answers = Answer.objects \
+        .filter(author=models.OuterRef('user')) \
+        .order_by() \
+        .values('author')
+    answers_total = answers.annotate(total=models.Count('pk')).values('total')
+    correct_total = answers.filter(correct=True).annotate(total=models.Count('pk')).values('total')
+    Profile.objects.update(
+        reputation=Coalesce(models.Subquery(likes_received), 0) * LIKE_REPUTATION
+        + Coalesce(models.Subquery(answers_total), 0) * ANSWER_REPUTATION
+        + Coalesce(models.Subquery(correct_total), 0) * CORRECT_ANSWER_REPUTATION
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_question_changed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='reputation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-reputation', 'id'], name='profile_reputation_idx'),
+        ),
+        migrations.RunPython(fill_reputation, migrations.RunPython.noop),
+    ]
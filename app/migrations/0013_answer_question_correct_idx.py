@@ -0,0 +1,21 @@
+# Generated by Django 4.0.3 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_profile_reputation'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='answer',
+            name='answer_question_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', '-correct', 'time', 'id'], name='answer_question_correct_idx'),
+        ),
+    ]
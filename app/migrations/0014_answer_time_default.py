@@ -0,0 +1,19 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_answer_question_correct_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
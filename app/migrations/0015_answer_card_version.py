@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_answer_time_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='card_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
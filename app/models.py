@@ -1,80 +1,374 @@
-from django.db import models
+from collections import Counter, defaultdict
+import datetime
+import itertools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from questions.settings import MEDIA_ROOT
+from app.avatars import get_avatar_thumbnails
+from app.search import SEARCH_TABLE, SearchDocumentField, make_match_query
 
+COUNTERS_UPDATE_BATCH = 500
+HOT_SNAPSHOT_BATCH = 1000
+TOP_TAGS_CACHE_KEY = 'top-tags'
+BEST_MEMBERS_CACHE_KEY = 'best-members'
+LISTINGS_GENERATION_CACHE_KEY = 'listings-generation'
+
+LIKE_REPUTATION = 1
+ANSWER_REPUTATION = 2
+CORRECT_ANSWER_REPUTATION = 10
 
-class ProfileManager(models.Manager):
-    def get_avatar_url(self, user_id):
-        avatar = Profile.objects.filter(user__pk=user_id)
-        if len(avatar) == 0:
-            return None
 
-        if not avatar[0].avatar:
+class ProfileManager(models.Manager):
+    def get_user_avatar(self, user):
+        profile = getattr(user, 'profile', None)
+        if profile is None:
             return None
 
-        return avatar[0].avatar.url
+        return get_avatar_thumbnails(profile.avatar.name)
+
+    def get_avatars(self, user_ids):
+        """Map user ids to avatar thumbnail urls in one query"""
+        user_ids = list(user_ids)
+        avatars = dict.fromkeys(user_ids)
+        if not user_ids:
+            return avatars
+
+        avatar_names = Profile.objects \
+            .filter(user_id__in=user_ids) \
+            .exclude(avatar='') \
+            .exclude(avatar__isnull=True) \
+            .values_list('user_id', 'avatar')
+        for user_id, avatar_name in avatar_names:
+            avatars[user_id] = get_avatar_thumbnails(avatar_name)
+        return avatars
+
+    def get_users_avatars(self, users):
+        """Like get_avatars, but profiles fetched along with the users are not queried again"""
+        avatars = {}
+        missing_ids = set()
+        for user in users:
+            if User.profile.is_cached(user):
+                avatars[user.pk] = self.get_user_avatar(user)
+            else:
+                missing_ids.add(user.pk)
+
+        avatars.update(self.get_avatars(missing_ids))
+        return avatars
+
+    def change_reputation(self, users_deltas):
+        """Apply reputation changes of users, one UPDATE per distinct change.
+
+        Bulk inserts of likes and answers do not change reputation, recount_reputation
+        is run after them instead.
+        """
+        users_by_delta = defaultdict(list)
+        for user_id, delta in users_deltas.items():
+            if delta:
+                users_by_delta[delta].append(user_id)
+
+        for delta, user_ids in users_by_delta.items():
+            for start in range(0, len(user_ids), COUNTERS_UPDATE_BATCH):
+                Profile.objects \
+                    .filter(user_id__in=user_ids[start:start + COUNTERS_UPDATE_BATCH]) \
+                    .update(reputation=models.F('reputation') + delta)
+
+    def change_authors_reputation(self, questions_deltas):
+        """Apply reputation changes to the authors of the questions"""
+        authors_deltas = Counter()
+        authors = Question.objects \
+            .filter(pk__in=list(questions_deltas)) \
+            .values_list('pk', 'author_id')
+        for question_id, author_id in authors:
+            authors_deltas[author_id] += questions_deltas[question_id]
+        self.change_reputation(authors_deltas)
+
+    def recount_reputation(self):
+        likes_received = Like.objects \
+            .filter(question__author=models.OuterRef('user')) \
+            .order_by() \
+            .values('question__author') \
+            .annotate(total=models.Count('pk')) \
+            .values('total')
+        answers = Answer.objects \
+            .filter(author=models.OuterRef('user')) \
+            .order_by() \
+            .values('author')
+        answers_total = answers.annotate(total=models.Count('pk')).values('total')
+        correct_total = answers.filter(correct=True).annotate(total=models.Count('pk')).values('total')
+        return Profile.objects.update(
+            reputation=Coalesce(models.Subquery(likes_received), 0) * LIKE_REPUTATION
+            + Coalesce(models.Subquery(answers_total), 0) * ANSWER_REPUTATION
+            + Coalesce(models.Subquery(correct_total), 0) * CORRECT_ANSWER_REPUTATION
+        )
+
+    def get_best_members(self):
+        members = cache.get(BEST_MEMBERS_CACHE_KEY)
+        if members is None:
+            members = self.count_best_members()
+            cache.set(BEST_MEMBERS_CACHE_KEY, members, settings.BEST_MEMBERS_CACHE_TIMEOUT)
+        return members
+
+    def count_best_members(self):
+        BEST_MEMBERS_AMOUNT = 4
+        profiles = Profile.objects \
+            .select_related('user') \
+            .order_by('-reputation', 'id')[:BEST_MEMBERS_AMOUNT]
+        return [
+            {
+                'username': profile.user.username,
+                'reputation': profile.reputation,
+                'avatar': get_avatar_thumbnails(profile.avatar.name),
+            }
+            for profile in profiles
+        ]
+
+    def invalidate_best_members(self):
+        cache.delete(BEST_MEMBERS_CACHE_KEY)
 
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     avatar = models.ImageField(blank=True, null=True)
+    reputation = models.IntegerField(default=0)
 
     objects = ProfileManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-reputation', 'id'], name='profile_reputation_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}"
 
 
 class QuestionsManager(models.Manager):
-    def get_hot(self, likes_to_hot):
-        result_query = []
-        questions = Question.objects.all()
-        for question in questions:
-            if Like.objects.count_question_likes(question.pk) >= likes_to_hot:
-                result_query.append(question)
+    def get_new(self):
+        return Question.objects.select_related('author__profile').order_by('-time', '-id')
 
-        return result_query
+    def get_hot(self, likes_to_hot):
+        return Question.objects \
+            .filter(likes_count__gte=likes_to_hot) \
+            .select_related('author__profile') \
+            .order_by('-likes_count', '-time', '-id')
+
+    def change_counter(self, counter_field, question_ids, delta):
+        if delta == 0:
+            return
+
+        question_ids = list(question_ids)
+        for start in range(0, len(question_ids), COUNTERS_UPDATE_BATCH):
+            Question.objects \
+                .filter(pk__in=question_ids[start:start + COUNTERS_UPDATE_BATCH]) \
+                .update(**{counter_field: models.F(counter_field) + delta}, **self.card_changes())
+
+    @staticmethod
+    def card_changes():
+        return {'card_version': models.F('card_version') + 1, 'changed_at': timezone.now()}
+
+    def bump_card_version(self, question_ids):
+        question_ids = list(question_ids)
+        for start in range(0, len(question_ids), COUNTERS_UPDATE_BATCH):
+            Question.objects \
+                .filter(pk__in=question_ids[start:start + COUNTERS_UPDATE_BATCH]) \
+                .update(**self.card_changes())
+
+    def change_counters(self, counter_field, questions_deltas):
+        questions_by_delta = defaultdict(list)
+        for question_id, delta in questions_deltas.items():
+            questions_by_delta[delta].append(question_id)
+
+        for delta, question_ids in questions_by_delta.items():
+            self.change_counter(counter_field, question_ids, delta)
+
+    def recount_counters(self):
+        likes_total = Like.objects \
+            .filter(question=models.OuterRef('pk')) \
+            .order_by() \
+            .values('question') \
+            .annotate(total=models.Count('pk')) \
+            .values('total')
+        answers_total = Answer.objects \
+            .filter(question=models.OuterRef('pk')) \
+            .order_by() \
+            .values('question') \
+            .annotate(total=models.Count('pk')) \
+            .values('total')
+        return Question.objects.update(
+            likes_count=Coalesce(models.Subquery(likes_total), 0),
+            answers_count=Coalesce(models.Subquery(answers_total), 0),
+            **self.card_changes()
+        )
+
+    def get_last_change(self):
+        """Time of the newest change of any question and the latest hot snapshot id, in one query"""
+        latest_snapshot = HotSnapshot.objects.order_by('-built_at').values('pk')[:1]
+        return Question.objects \
+            .annotate(hot_snapshot=models.Subquery(latest_snapshot)) \
+            .order_by('-changed_at') \
+            .values('changed_at', 'hot_snapshot') \
+            .first()
+
+    def get_listings_generation(self):
+        """Time of the last deletion of a question, which changes listings without moving any changed_at"""
+        generation = cache.get(LISTINGS_GENERATION_CACHE_KEY)
+        if generation is None:
+            # Not the time of a deletion, but an evicted generation must not bring back old validators
+            generation = timezone.now()
+            cache.set(LISTINGS_GENERATION_CACHE_KEY, generation, None)
+        return generation
+
+    def bump_listings_generation(self):
+        cache.set(LISTINGS_GENERATION_CACHE_KEY, timezone.now(), None)
+
+    def get_question(self, question_id):
+        return Question.objects \
+            .select_related('author__profile') \
+            .filter(pk=question_id) \
+            .first()
+
+    def get_changed_at(self, question_id):
+        return Question.objects \
+            .filter(pk=question_id) \
+            .values_list('changed_at', flat=True) \
+            .first()
+
+    def search(self, query):
+        match_query = make_match_query(query)
+        if not match_query:
+            return Question.objects.none()
+
+        return Question.objects \
+            .filter(search__document__match=match_query) \
+            .select_related('author__profile') \
+            .order_by('search__rank')
 
     def get_tagged_question(self, tag_name):
-        return Tag.objects.filter(tag_name__exact=tag_name)[0].question.all()
+        return Question.objects \
+            .filter(tag__tag_name=tag_name) \
+            .select_related('author__profile') \
+            .order_by('-time', '-id')
 
 
 class Question(models.Model):
     title = models.CharField(max_length=256)
     text = models.TextField()
-    time = models.DateTimeField(auto_now_add=True)
+    time = models.DateTimeField(default=timezone.now)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    likes_count = models.PositiveIntegerField(default=0)
+    answers_count = models.PositiveIntegerField(default=0)
+    card_version = models.PositiveIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     objects = QuestionsManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-likes_count', '-time', '-id'], name='question_hot_idx'),
+            models.Index(fields=['-time', '-id'], name='question_new_idx'),
+        ]
+
     def __str__(self):
         return f"{self.author.username} {self.title}"
 
 
+class QuestionSearch(models.Model):
+    question = models.OneToOneField(
+        Question,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search'
+    )
+    title = models.TextField()
+    text = models.TextField()
+    document = SearchDocumentField(db_column=SEARCH_TABLE)
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = SEARCH_TABLE
+
+
 class AnswerManager(models.Manager):
-    def count_question_answers(self, question_id):
-        return Answer.objects.filter(question__pk=question_id).count()
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        Question.objects.change_counters('answers_count', Counter(obj.question_id for obj in created))
+        return created
+
+    def bump_card_version(self, answer_ids):
+        answer_ids = list(answer_ids)
+        for start in range(0, len(answer_ids), COUNTERS_UPDATE_BATCH):
+            Answer.objects \
+                .filter(pk__in=answer_ids[start:start + COUNTERS_UPDATE_BATCH]) \
+                .update(card_version=models.F('card_version') + 1)
+
+    def get_question_answers(self, question_id):
+        """Answers of the question with their authors, correct answers first"""
+        return Answer.objects \
+            .filter(question_id=question_id) \
+            .select_related('author__profile') \
+            .order_by('-correct', 'time', 'id')
+
 
-    def question_answers(self, question_id):
-        return Answer.objects.filter(question__pk=question_id)
+def get_answer_reputation(correct):
+    return ANSWER_REPUTATION + (CORRECT_ANSWER_REPUTATION if correct else 0)
 
 
 class Answer(models.Model):
     text = models.TextField()
     correct = models.BooleanField(default=False)
-    time = models.DateTimeField(auto_now_add=True)
+    time = models.DateTimeField(default=timezone.now)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    card_version = models.PositiveIntegerField(default=0)
 
     objects = AnswerManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', '-correct', 'time', 'id'], name='answer_question_correct_idx'),
+        ]
+
     def __str__(self):
         return f"{self.author.username} {self.question.title}"
 
 
 class LikeManager(models.Manager):
-    def count_question_likes(self, question_id):
-        return Like.objects.filter(question__pk=question_id).count()
+    def set_like(self, user_id, question_id, liked):
+        """Make the user like the question or not, return whether anything has changed"""
+        if not liked:
+            deleted, _ = Like.objects.filter(user_id=user_id, question_id=question_id).delete()
+            return deleted > 0
+
+        try:
+            with transaction.atomic():
+                Like.objects.create(user_id=user_id, question_id=question_id)
+        except IntegrityError:
+            return False
+        return True
+
+    def is_liked(self, user_id, question_id):
+        return Like.objects.filter(user_id=user_id, question_id=question_id).exists()
+
+    def toggle_like(self, user_id, question_id):
+        """Like the question or take the like back, return whether the question is liked now"""
+        if self.set_like(user_id, question_id, False):
+            return False
+
+        self.set_like(user_id, question_id, True)
+        return True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        Question.objects.change_counters('likes_count', Counter(obj.question_id for obj in created))
+        return created
 
 
 class Like(models.Model):
@@ -83,25 +377,120 @@ class Like(models.Model):
 
     objects = LikeManager()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='like_user_question_unique'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} {self.question.title}"
 
 
-class TagManager(models.Manager):
-    def question_tags(self, question_id):
-        return Tag.objects.filter(question__pk=question_id)
+class HotSnapshotManager(models.Manager):
+    def get_latest(self):
+        return HotSnapshot.objects.order_by('-built_at').first()
+
+    def build(self, likes_to_hot):
+        build_start = time.monotonic()
+        with transaction.atomic():
+            snapshot = HotSnapshot.objects.create(
+                built_at=timezone.now(),
+                build_duration=datetime.timedelta(),
+                likes_to_hot=likes_to_hot
+            )
+            ranked_questions = Question.objects \
+                .get_hot(likes_to_hot) \
+                .select_related(None) \
+                .values_list('pk', 'likes_count') \
+                .iterator()
+            entries = (
+                HotSnapshotEntry(snapshot=snapshot, question_id=question_id, score=score, rank=rank)
+                for rank, (question_id, score) in enumerate(ranked_questions)
+            )
+            while batch := list(itertools.islice(entries, HOT_SNAPSHOT_BATCH)):
+                HotSnapshotEntry.objects.bulk_create(batch)
+
+            snapshot.build_duration = datetime.timedelta(seconds=time.monotonic() - build_start)
+            snapshot.save(update_fields=['build_duration'])
+            HotSnapshot.objects.exclude(pk=snapshot.pk).delete()
+        return snapshot
+
+    def record_like(self, question_id, delta):
+        snapshot = self.get_latest()
+        if snapshot is None:
+            return
+
+        entries = snapshot.entries.filter(question_id=question_id)
+        updated = entries.update(score=models.F('score') + delta)
+        if updated:
+            entries.filter(score__lt=snapshot.likes_to_hot).delete()
+            return
+
+        likes_count = Question.objects.filter(pk=question_id).values_list('likes_count', flat=True).first()
+        if likes_count is not None and likes_count >= snapshot.likes_to_hot:
+            last_rank = snapshot.entries.aggregate(last_rank=models.Max('rank'))['last_rank']
+            HotSnapshotEntry.objects.create(
+                snapshot=snapshot,
+                question_id=question_id,
+                score=likes_count,
+                rank=(last_rank or 0) + 1
+            )
+
+
+class HotSnapshot(models.Model):
+    built_at = models.DateTimeField(db_index=True)
+    build_duration = models.DurationField()
+    likes_to_hot = models.PositiveIntegerField()
+
+    objects = HotSnapshotManager()
+
+    def get_questions(self):
+        return Question.objects \
+            .filter(hotsnapshotentry__snapshot=self) \
+            .select_related('author__profile') \
+            .order_by('-hotsnapshotentry__score', 'hotsnapshotentry__rank')
+
+    def __str__(self):
+        return f"{self.built_at} ({self.build_duration})"
+
+
+class HotSnapshotEntry(models.Model):
+    snapshot = models.ForeignKey(HotSnapshot, on_delete=models.CASCADE, related_name='entries')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    score = models.PositiveIntegerField()
+    rank = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['snapshot', '-score', 'rank'], name='hot_snapshot_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.snapshot_id} {self.question_id} {self.score}"
+
+
+class TagManager(models.Manager):
     def get_top_tags(self):
+        tags = cache.get(TOP_TAGS_CACHE_KEY)
+        if tags is None:
+            tags = self.count_top_tags()
+            cache.set(TOP_TAGS_CACHE_KEY, tags, settings.TOP_TAGS_CACHE_TIMEOUT)
+        return tags
+
+    def count_top_tags(self):
         TOP_TAGS_AMOUNT = 20
         tags = Tag.objects \
                    .values('tag_name') \
                    .annotate(total=models.Count('question')) \
                    .order_by('-total')[:TOP_TAGS_AMOUNT]
-        return tags
+        return list(tags)
+
+    def invalidate_top_tags(self):
+        cache.delete(TOP_TAGS_CACHE_KEY)
 
 
 class Tag(models.Model):
-    tag_name = models.CharField(max_length=20)
+    tag_name = models.CharField(max_length=20, unique=True)
     question = models.ManyToManyField(Question)
 
     objects = TagManager()
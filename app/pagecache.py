@@ -0,0 +1,173 @@
+"""Full-page cache of the questions pages for anonymous readers.
+
+A page is cached under its route, pagination parameters and the generation of the group
+it belongs to: a question page to its question, tag listings to their tag, and the first
+pages of the index and hot listings to groups of their own. A purge stores new generations
+of the groups, so every page of a group is dropped with one cache write, while deeper
+pages of the index and hot listings are left to expire after PAGE_CACHE_TIMEOUT.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from app.models import Tag
+from app.pagination import PAGINATION_PARAMS
+
+# Route name to the kind of the page, async routes share pages groups with sync ones
+CACHED_ROUTES = {
+    'index-view': 'index',
+    'async-index-view': 'index',
+    'hot-view': 'hot',
+    'async-hot-view': 'hot',
+    'tag-view': 'tag',
+    'async-tag-view': 'tag',
+    'question-view': 'question',
+    'async-question-view': 'question',
+}
+FIRST_PAGE_GROUPS = ('index:first', 'hot:first')
+
+
+class PageCacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.purged_groups = 0
+
+    def record_hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def record_purge(self, groups_amount):
+        with self.lock:
+            self.purged_groups += groups_amount
+
+    def aggregate(self):
+        with self.lock:
+            hits, misses, purged_groups = self.hits, self.misses, self.purged_groups
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'purged_groups': purged_groups,
+        }
+
+
+def is_first_page(params):
+    return not params.get('after') and not params.get('before') and params.get('page', '1') == '1'
+
+
+def get_page_group(kind, kwargs, params):
+    if kind == 'question':
+        return f"question:{kwargs['question_id']}"
+    if kind == 'tag':
+        return f"tag:{kwargs['tag_name']}"
+    return f'{kind}:first' if is_first_page(params) else f'{kind}:rest'
+
+
+class PageCache:
+    def __init__(self):
+        self.stats = PageCacheStats()
+
+    @property
+    def cache(self):
+        return caches[settings.PAGE_CACHE]
+
+    @staticmethod
+    def make_generation_key(group):
+        return f'page-generation:{hashlib.md5(group.encode()).hexdigest()}'
+
+    def get_generation(self, group):
+        key = self.make_generation_key(group)
+        generation = self.cache.get(key)
+        if generation is None:
+            # Not a counter starting from 0: an evicted generation must not bring back old pages
+            generation = time.time_ns()
+            self.cache.set(key, generation, None)
+        return generation
+
+    def get_request_key(self, request):
+        """Cache key of the page, None if the request is not served from the cache"""
+        if request.method != 'GET' or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        if any(param not in PAGINATION_PARAMS for param in request.GET):
+            return None
+
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        kind = CACHED_ROUTES.get(match.url_name)
+        if kind is None:
+            return None
+
+        params = request.GET.dict()
+        group = get_page_group(kind, match.kwargs, params)
+        page = ':'.join(f'{param}={params.get(param, "")}' for param in PAGINATION_PARAMS)
+        identity = hashlib.md5(f'{match.url_name}:{group}:{page}'.encode()).hexdigest()
+        return f'page:{identity}:{self.get_generation(group)}'
+
+    def get(self, request, key):
+        cached = self.cache.get(key)
+        if cached is None:
+            self.stats.record_miss()
+            return None
+
+        self.stats.record_hit()
+        content, headers = cached
+        response = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+            response=HttpResponse(content, headers=headers),
+        )
+        response['X-Page-Cache'] = 'HIT'
+        return response
+
+    def store(self, key, response):
+        response['X-Page-Cache'] = 'MISS'
+        if response.status_code != 200 or response.streaming:
+            return
+        # A session or a CSRF token issued by this response belongs to one reader, the page
+        # is not shared then. Cached pages render no CSRF token, likes.js asks for it.
+        if settings.SESSION_COOKIE_NAME in response.cookies or settings.CSRF_COOKIE_NAME in response.cookies:
+            return
+
+        # Cookies are kept apart from the headers and are never cached
+        headers = {header: value for header, value in response.items() if header != 'X-Page-Cache'}
+        self.cache.set(key, (response.content, headers), settings.PAGE_CACHE_TIMEOUT)
+
+    def purge(self, groups):
+        groups = set(groups)
+        generation = time.time_ns()
+        self.cache.set_many({self.make_generation_key(group): generation for group in groups}, None)
+        self.stats.record_purge(len(groups))
+
+    def purge_questions(self, question_ids, tag_names=()):
+        """Drop pages showing the questions: their own pages, their tags and the first listings pages"""
+        question_ids = list(question_ids)
+        tag_names = set(tag_names)
+        if question_ids:
+            tag_names.update(
+                Tag.objects.filter(question__in=question_ids).values_list('tag_name', flat=True)
+            )
+
+        groups = [f'question:{question_id}' for question_id in question_ids]
+        groups.extend(f'tag:{tag_name}' for tag_name in tag_names)
+        groups.extend(FIRST_PAGE_GROUPS)
+        self.purge(groups)
+
+
+page_cache = PageCache()
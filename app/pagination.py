@@ -0,0 +1,179 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.http import urlencode
+
+PAGES_WINDOW = 2
+CURSOR_SEPARATOR = ','
+PAGINATION_PARAMS = ('page', 'after', 'before')
+# Larger page numbers would overflow the OFFSET, they get an empty page
+MAX_PAGE_NUMBER = 10 ** 9
+# Database integers are 64-bit signed, larger cursor values are not valid cursors
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def get_base_params(request):
+    return [(key, value) for key, value in request.GET.items() if key not in PAGINATION_PARAMS]
+
+
+class BasePage:
+    base_params = ()
+
+    def make_query(self, **params):
+        return urlencode(list(self.base_params) + list(params.items()))
+
+
+class WindowPage(BasePage):
+    """Page of the offset pagination which never counts the whole listing"""
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_next(self):
+        return self._has_next
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_query(self):
+        return self.make_query(page=self.previous_page_number())
+
+    def next_query(self):
+        return self.make_query(page=self.next_page_number())
+
+    def page_window(self):
+        last_page = self.next_page_number() if self.has_next() else self.number
+        first_page = max(1, self.number - PAGES_WINDOW)
+        return [(number, self.make_query(page=number)) for number in range(first_page, last_page + 1)]
+
+
+class WindowPaginator:
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        return min(max(number, 1), MAX_PAGE_NUMBER)
+
+    def get_request_page(self, request):
+        page = self.get_page(request.GET.get('page', 1))
+        page.base_params = get_base_params(request)
+        return page
+
+    def get_page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return WindowPage(rows[:self.per_page], number, len(rows) > self.per_page)
+
+
+class KeysetPage(BasePage):
+    """Page of the keyset pagination addressed by ?after= and ?before= cursors"""
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_previous = has_previous and bool(object_list)
+        self._has_next = has_next and bool(object_list)
+        self.first_cursor = paginator.make_cursor(object_list[0]) if object_list else None
+        self.last_cursor = paginator.make_cursor(object_list[-1]) if object_list else None
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def previous_query(self):
+        return self.make_query(before=self.first_cursor)
+
+    def next_query(self):
+        return self.make_query(after=self.last_cursor)
+
+    def page_window(self):
+        return []
+
+
+class KeysetPaginator:
+    def __init__(self, object_list, per_page, ordering):
+        self.object_list = object_list.order_by(*ordering)
+        self.per_page = per_page
+        self.reversed_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+    def make_cursor(self, obj):
+        return CURSOR_SEPARATOR.join(str(getattr(obj, field)) for field, _ in self.ordering)
+
+    def parse_cursor(self, cursor):
+        if not cursor:
+            return None
+
+        values = cursor.split(CURSOR_SEPARATOR)
+        if len(values) != len(self.ordering):
+            return None
+
+        model_meta = self.object_list.model._meta
+        parsed_values = []
+        try:
+            for (field_name, _), value in zip(self.ordering, values):
+                field = model_meta.get_field(field_name)
+                parsed_value = field.to_python(value)
+                if isinstance(parsed_value, int) and parsed_value not in INTEGER_RANGE:
+                    return None
+                parsed_values.append(parsed_value)
+        except ValidationError:
+            return None
+        return parsed_values
+
+    def seek_filter(self, values, forward):
+        bound = Q()
+        for position, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending == forward else 'gt'
+            equal_prefix = {prefix_field: value for (prefix_field, _), value in zip(self.ordering, values[:position])}
+            bound |= Q(**equal_prefix, **{f'{field}__{lookup}': values[position]})
+
+        leading_field, leading_descending = self.ordering[0]
+        leading_lookup = 'lte' if leading_descending == forward else 'gte'
+        return Q(**{f'{leading_field}__{leading_lookup}': values[0]}) & bound
+
+    def get_request_page(self, request):
+        page = self.get_page(request.GET.get('after'), request.GET.get('before'))
+        page.base_params = get_base_params(request)
+        return page
+
+    def get_page(self, after=None, before=None):
+        after_values = self.parse_cursor(after)
+        before_values = self.parse_cursor(before)
+
+        if before_values is not None:
+            rows = list(
+                self.object_list
+                    .filter(self.seek_filter(before_values, forward=False))
+                    .order_by(*self.reversed_ordering)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            return KeysetPage(rows[:self.per_page][::-1], self, has_previous, True)
+
+        rows = self.object_list
+        if after_values is not None:
+            rows = rows.filter(self.seek_filter(after_values, forward=True))
+        rows = list(rows[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page], self, after_values is not None, len(rows) > self.per_page)
+
+
+def make_paginator(request, object_list, per_page, keyset_ordering=None, keyset_pagination=False):
+    keyset_requested = 'after' in request.GET or 'before' in request.GET
+    if keyset_ordering is not None and (keyset_pagination or keyset_requested):
+        return KeysetPaginator(object_list, per_page, keyset_ordering)
+    return WindowPaginator(object_list, per_page)
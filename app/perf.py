@@ -0,0 +1,113 @@
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.template.backends import django as django_backend
+
+current_request_stats = contextvars.ContextVar('current_request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        self.rendering = False
+
+    @property
+    def view_time(self):
+        return max(self.total_time - self.template_time, 0.0)
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.sql_time += time.perf_counter() - start
+                self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection, so queries run by async views in worker threads are counted too"""
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ViewsStatsRegistry:
+    SAMPLES_PER_VIEW = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=self.SAMPLES_PER_VIEW))
+
+    def record(self, view_name, stats):
+        with self.lock:
+            self.samples[view_name].append((stats.total_time, stats.queries))
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+        return sorted_values[index]
+
+    def aggregate(self):
+        with self.lock:
+            samples = {view_name: list(view_samples) for view_name, view_samples in self.samples.items()}
+
+        result = []
+        for view_name, view_samples in sorted(samples.items()):
+            durations = sorted(duration for duration, _ in view_samples)
+            queries = sorted(queries for _, queries in view_samples)
+            result.append({
+                'view': view_name,
+                'requests': len(view_samples),
+                'p50_ms': self.percentile(durations, 0.5) * 1000,
+                'p95_ms': self.percentile(durations, 0.95) * 1000,
+                'p50_queries': self.percentile(queries, 0.5),
+                'p95_queries': self.percentile(queries, 0.95),
+            })
+        return result
+
+
+views_stats = ViewsStatsRegistry()
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = current_request_stats.get()
+        if stats is None or stats.rendering:
+            return self.template.render(context, request)
+
+        stats.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+            stats.rendering = False
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Django templates backend measuring render time of the current request"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
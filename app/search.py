@@ -0,0 +1,85 @@
+"""SQLite FTS5 index over question titles and texts.
+
+The index is an external content table kept in sync with app_question by triggers.
+SQLite drops the triggers together with the table, so every migration which remakes
+app_question has to call create_sync_triggers again.
+"""
+import re
+
+from django.db import connection, models
+
+SEARCH_TABLE = 'app_question_fts'
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+
+CREATE_SEARCH_TABLE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"title, text, content='app_question', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25({TITLE_WEIGHT}, {TEXT_WEIGHT})')",
+]
+DROP_SEARCH_TABLE = [
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+]
+CREATE_SYNC_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON app_question BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON app_question BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, text ON app_question BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text); "
+    f"END",
+]
+DROP_SYNC_TRIGGERS = [
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update",
+]
+REBUILD_SEARCH_INDEX = [
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+]
+
+
+def execute_statements(statements, using_connection=connection):
+    if using_connection.vendor != 'sqlite':
+        return
+
+    with using_connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def create_sync_triggers(using_connection=connection):
+    execute_statements(CREATE_SYNC_TRIGGERS, using_connection)
+
+
+def drop_sync_triggers(using_connection=connection):
+    execute_statements(DROP_SYNC_TRIGGERS, using_connection)
+
+
+def rebuild_search_index(using_connection=connection):
+    execute_statements(REBUILD_SEARCH_INDEX, using_connection)
+
+
+def make_match_query(query):
+    """Turn user input into an FTS5 query matching every word, so FTS5 syntax in it is never interpreted"""
+    words = re.findall(r'\w+', query or '')
+    return ' '.join(f'"{word}"' for word in words)
+
+
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchDocumentField(models.TextField):
+    """Hidden FTS5 column named after the table, MATCH against it searches every indexed column"""
+
+
+SearchDocumentField.register_lookup(Match)
@@ -0,0 +1,171 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from app.autocomplete import tag_index
+from app.avatars import has_thumbnails, make_thumbnails
+from app.db import apply_pragmas
+from app.likes import likes_counter
+from app.models import Question, Answer, Like, Tag, Profile, get_answer_reputation
+from app.pagecache import page_cache
+from app.perf import install_query_recorder
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        likes_counter.add(instance.question_id, 1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    likes_counter.add(instance.question_id, -1)
+
+
+@receiver(pre_save, sender=Answer)
+def answer_saving(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance.previous_state = Answer.objects \
+            .filter(pk=instance.pk) \
+            .values('correct', 'question_id', 'author_id') \
+            .first()
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, created, **kwargs):
+    if created:
+        Question.objects.change_counter('answers_count', [instance.question_id], 1)
+        Profile.objects.change_reputation({instance.author_id: get_answer_reputation(instance.correct)})
+        page_cache.purge_questions([instance.question_id])
+        return
+
+    Answer.objects.bump_card_version([instance.pk])
+    previous = getattr(instance, 'previous_state', None)
+    if previous is None:
+        Question.objects.bump_card_version([instance.question_id])
+        page_cache.purge_questions([instance.question_id])
+        return
+
+    # The answer may be moved to another question or author, in the admin for example
+    if previous['question_id'] != instance.question_id:
+        Question.objects.change_counter('answers_count', [previous['question_id']], -1)
+        Question.objects.change_counter('answers_count', [instance.question_id], 1)
+    else:
+        Question.objects.bump_card_version([instance.question_id])
+    page_cache.purge_questions({previous['question_id'], instance.question_id})
+
+    reputation_changes = Counter()
+    reputation_changes[previous['author_id']] -= get_answer_reputation(previous['correct'])
+    reputation_changes[instance.author_id] += get_answer_reputation(instance.correct)
+    Profile.objects.change_reputation(reputation_changes)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    Question.objects.change_counter('answers_count', [instance.question_id], -1)
+    Profile.objects.change_reputation({instance.author_id: -get_answer_reputation(instance.correct)})
+    page_cache.purge_questions([instance.question_id])
+
+
+@receiver(post_save, sender=Profile)
+def profile_avatar_saved(sender, instance, **kwargs):
+    if instance.avatar and not has_thumbnails(instance.avatar.name):
+        make_thumbnails(instance.avatar)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump_user_cards(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # Logins save last_login only, which no card shows
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    bump_user_cards(instance.pk)
+
+
+def bump_user_cards(user_id):
+    question_ids = set(Question.objects.filter(author=user_id).values_list('pk', flat=True))
+    answers = list(Answer.objects.filter(author=user_id).values_list('pk', 'question_id'))
+    question_ids.update(question_id for _, question_id in answers)
+    Question.objects.bump_card_version(question_ids)
+    Answer.objects.bump_card_version(answer_id for answer_id, _ in answers)
+    page_cache.purge_questions(question_ids)
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, **kwargs):
+    if not created:
+        Question.objects.bump_card_version([instance.pk])
+    page_cache.purge_questions([instance.pk])
+
+
+@receiver(pre_delete, sender=Question)
+def question_deleting(sender, instance, **kwargs):
+    Question.objects.bump_listings_generation()
+    page_cache.purge_questions([instance.pk])
+
+
+@receiver(m2m_changed, sender=Tag.question.through)
+def tag_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        Tag.objects.invalidate_top_tags()
+
+    if action in ('post_add', 'post_remove'):
+        question_ids = [instance.pk] if reverse else pk_set
+        Question.objects.bump_card_version(question_ids)
+        update_tag_index_totals(instance, reverse, pk_set, 1 if action == 'post_add' else -1)
+        # Removed tags are not linked to the questions anymore, their names are passed explicitly
+        tag_names = Tag.objects.filter(pk__in=pk_set).values_list('tag_name', flat=True) if reverse \
+            else [instance.tag_name]
+        page_cache.purge_questions(question_ids, tag_names)
+    elif action == 'pre_clear':
+        question_ids = [instance.pk] if reverse else list(instance.question.values_list('pk', flat=True))
+        Question.objects.bump_card_version(question_ids)
+        tag_index.invalidate()
+        page_cache.purge_questions(question_ids, [] if reverse else [instance.tag_name])
+
+
+def update_tag_index_totals(instance, reverse, pk_set, delta):
+    if not reverse:
+        tag_index.change_total(instance.tag_name, delta * len(pk_set))
+    elif tag_index.is_loaded():
+        for tag_name in Tag.objects.filter(pk__in=pk_set).values_list('tag_name', flat=True):
+            tag_index.change_total(tag_name, delta)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if created:
+        tag_index.add_tag(instance.tag_name)
+    else:
+        question_ids = list(instance.question.values_list('pk', flat=True))
+        Question.objects.bump_card_version(question_ids)
+        page_cache.purge_questions(question_ids, [instance.tag_name])
+        # The previous name is unknown here, the index is reloaded on next use
+        tag_index.invalidate()
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    question_ids = list(instance.question.values_list('pk', flat=True))
+    Question.objects.bump_card_version(question_ids)
+    page_cache.purge_questions(question_ids, [instance.tag_name])
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    Tag.objects.invalidate_top_tags()
+    tag_index.remove_tag(instance.tag_name)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    apply_pragmas(connection)
+    install_query_recorder(connection)
@@ -1,3 +1,634 @@
-from django.test import TestCase
+import io
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.assets import available_encodings, write_encoded_manifest, write_encoded_variants
+from app.autocomplete import tag_index
+from app.cards import answer_cards
+from app.management.commands import explainqueries, filldata
+from app.middleware import StaticFilesMiddleware
+from app.models import (
+    ANSWER_REPUTATION, CORRECT_ANSWER_REPUTATION, LIKE_REPUTATION, Answer, HotSnapshot, Like, Profile, Question, Tag
+)
+from app.pagination import KeysetPaginator, WindowPaginator
+
+
+def create_user(username):
+    user = User.objects.create(username=username)
+    Profile.objects.create(user=user)
+    return user
+
+
+def get_reputation(user):
+    return Profile.objects.get(user=user).reputation
+
+
+def clear_caches():
+    # Primary keys are reused after a test rolls back, cards and pages of old rows must go
+    for cache in caches.all():
+        cache.clear()
+
+
+class CountersSignalsTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.question = Question.objects.create(title='title', text='text', author=self.author)
+
+    def test_likes_change_likes_count_and_author_reputation(self):
+        Like.objects.create(user=self.reader, question=self.question)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.likes_count, 1)
+        self.assertEqual(get_reputation(self.author), LIKE_REPUTATION)
+
+        Like.objects.filter(user=self.reader, question=self.question).delete()
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.likes_count, 0)
+        self.assertEqual(get_reputation(self.author), 0)
+
+    def test_answers_change_answers_count_and_author_reputation(self):
+        answer = Answer.objects.create(text='answer', question=self.question, author=self.reader)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answers_count, 1)
+        self.assertEqual(get_reputation(self.reader), ANSWER_REPUTATION)
+
+        answer.correct = True
+        answer.save()
+        self.assertEqual(get_reputation(self.reader), ANSWER_REPUTATION + CORRECT_ANSWER_REPUTATION)
+
+        answer.delete()
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answers_count, 0)
+        self.assertEqual(get_reputation(self.reader), 0)
+
+    def test_bulk_create_changes_counters(self):
+        Answer.objects.bulk_create([
+            Answer(text='answer', question=self.question, author=self.reader) for _ in range(3)
+        ])
+        Like.objects.bulk_create([Like(user=self.reader, question=self.question)])
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answers_count, 3)
+        self.assertEqual(self.question.likes_count, 1)
+
+    def test_moved_answer_changes_counters_of_both_questions(self):
+        other_question = Question.objects.create(title='other', text='text', author=self.author)
+        answer = Answer.objects.create(text='answer', question=self.question, author=self.reader, correct=True)
+
+        answer.question = other_question
+        answer.author = self.author
+        answer.save()
+        self.question.refresh_from_db()
+        other_question.refresh_from_db()
+        self.assertEqual((self.question.answers_count, other_question.answers_count), (0, 1))
+        self.assertEqual(get_reputation(self.reader), 0)
+        self.assertEqual(get_reputation(self.author), ANSWER_REPUTATION + CORRECT_ANSWER_REPUTATION)
+
+    def test_recount_keeps_incremental_values(self):
+        Like.objects.create(user=self.reader, question=self.question)
+        Answer.objects.create(text='answer', question=self.question, author=self.reader, correct=True)
+        Answer.objects.create(text='answer', question=self.question, author=self.author)
+        incremental = {
+            'counters': list(Question.objects.values_list('pk', 'likes_count', 'answers_count')),
+            'reputation': list(Profile.objects.order_by('pk').values_list('pk', 'reputation')),
+        }
+
+        Question.objects.recount_counters()
+        Profile.objects.recount_reputation()
+        self.assertEqual(incremental, {
+            'counters': list(Question.objects.values_list('pk', 'likes_count', 'answers_count')),
+            'reputation': list(Profile.objects.order_by('pk').values_list('pk', 'reputation')),
+        })
+
+
+class HotSnapshotTests(TestCase):
+    LIKES_TO_HOT = 2
+
+    def setUp(self):
+        self.readers = [create_user(f'reader{number}') for number in range(3)]
+        author = self.readers[0]
+        self.questions = [
+            Question.objects.create(title=f'title {number}', text='text', author=author) for number in range(3)
+        ]
+
+    def like(self, question, readers_amount):
+        for reader in self.readers[:readers_amount]:
+            Like.objects.create(user=reader, question=question)
+
+    def get_hot_ids(self):
+        return list(HotSnapshot.objects.get_latest().get_questions().values_list('pk', flat=True))
+
+    def test_build_ranks_questions_over_threshold(self):
+        self.like(self.questions[0], 2)
+        self.like(self.questions[1], 3)
+        self.like(self.questions[2], 1)
+        HotSnapshot.objects.build(self.LIKES_TO_HOT)
+        self.assertEqual(self.get_hot_ids(), [self.questions[1].pk, self.questions[0].pk])
+
+    def test_rebuild_replaces_previous_snapshot(self):
+        first = HotSnapshot.objects.build(self.LIKES_TO_HOT)
+        second = HotSnapshot.objects.build(self.LIKES_TO_HOT)
+        self.assertEqual(list(HotSnapshot.objects.values_list('pk', flat=True)), [second.pk])
+        self.assertNotEqual(first.pk, second.pk)
+
+    def test_likes_move_questions_in_and_out_of_snapshot(self):
+        HotSnapshot.objects.build(self.LIKES_TO_HOT)
+        self.like(self.questions[2], 2)
+        self.assertEqual(self.get_hot_ids(), [self.questions[2].pk])
+
+        Like.objects.filter(question=self.questions[2], user=self.readers[0]).delete()
+        self.assertEqual(self.get_hot_ids(), [])
+
+
+class TagQuestionsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_tag_page_lists_tagged_questions_only(self):
+        author = create_user('author')
+        tagged = Question.objects.create(title='tagged title', text='text', author=author)
+        Question.objects.create(title='untagged title', text='text', author=author)
+        Tag.objects.create(tag_name='python').question.add(tagged)
+
+        response = self.client.get(reverse('tag-view', args=['python']))
+        self.assertContains(response, 'tagged title')
+        self.assertNotContains(response, 'untagged title')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        author = create_user('author')
+        self.questions = [
+            Question.objects.create(title=f'title {number}', text='text', author=author) for number in range(2)
+        ]
+
+    def test_fresh_listing_answers_not_modified(self):
+        response = self.client.get(reverse('index-view'))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(reverse('index-view'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        path = reverse('question-view', args=[self.questions[0].pk])
+        last_modified = self.client.get(path)['Last-Modified']
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_changed_question_is_modified(self):
+        path = reverse('question-view', args=[self.questions[0].pk])
+        etag = self.client.get(path)['ETag']
+
+        self.questions[0].text = 'edited text'
+        self.questions[0].save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'edited text')
+
+    def test_deleted_question_changes_listing_validators(self):
+        response = self.client.get(reverse('index-view'))
+        etag = response['ETag']
+
+        self.questions[0].delete()
+        response = self.client.get(reverse('index-view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotContains(response, 'title 0')
+
+
+class AsyncViewsTests(TransactionTestCase):
+    # Async views query in worker threads, which would not see rows of an open test transaction
+    def setUp(self):
+        clear_caches()
+        author = create_user('author')
+        self.question = Question.objects.create(title='async title', text='text', author=author)
+        Tag.objects.create(tag_name='python').question.add(self.question)
+        Answer.objects.create(text='async answer', question=self.question, author=author)
+
+    async def test_pages_render_as_sync_ones(self):
+        paths = [
+            reverse('async-index-view'),
+            reverse('async-tag-view', args=['python']),
+            reverse('async-search-view') + '?q=async',
+            reverse('async-question-view', args=[self.question.pk]),
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                response = await self.async_client.get(path)
+                self.assertContains(response, 'async title')
+        response = await self.async_client.get(reverse('async-question-view', args=[self.question.pk]))
+        self.assertContains(response, 'async answer')
+
+    async def test_fresh_page_answers_not_modified(self):
+        path = reverse('async-question-view', args=[self.question.pk])
+        response = await self.async_client.get(path)
+        # AsyncClient of Django 4.0 sends extra arguments as headers named as they are, not as META keys
+        response = await self.async_client.get(path, **{'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_unknown_question_is_not_found(self):
+        response = await self.async_client.get(reverse('async-question-view', args=[self.question.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+class LikeViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.reader = create_user('reader')
+        self.question = Question.objects.create(title='title', text='text', author=create_user('author'))
+        self.path = reverse('like-view', args=[self.question.pk])
+
+    def like(self, data=None):
+        return self.client.post(self.path, data or {})
+
+    def test_anonymous_user_is_asked_to_log_in(self):
+        response = self.like({'liked': '1'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['login_url'], reverse('login-view'))
+        self.assertFalse(Like.objects.exists())
+
+    def test_unknown_question_is_not_found(self):
+        self.client.force_login(self.reader)
+        response = self.client.post(reverse('like-view', args=[self.question.pk + 1]), {'liked': '1'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(reverse('like-view', args=[self.question.pk + 1])).status_code, 404)
+
+    def test_set_like_is_idempotent(self):
+        self.client.force_login(self.reader)
+        for _ in range(2):
+            self.assertEqual(self.like({'liked': '1'}).json(), {'liked': True, 'likes_count': 1})
+        self.assertEqual(self.client.get(self.path).json(), {'liked': True, 'likes_count': 1})
+
+        for _ in range(2):
+            self.assertEqual(self.like({'liked': '0'}).json(), {'liked': False, 'likes_count': 0})
+
+    def test_like_without_value_is_toggled(self):
+        self.client.force_login(self.reader)
+        self.assertEqual(self.like().json(), {'liked': True, 'likes_count': 1})
+        self.assertEqual(self.like().json(), {'liked': False, 'likes_count': 0})
+
+    def test_invalid_value_is_rejected(self):
+        self.client.force_login(self.reader)
+        for value in ('true', '', '2'):
+            with self.subTest(value=value):
+                self.assertEqual(self.like({'liked': value}).status_code, 400)
+        self.assertFalse(Like.objects.exists())
+
+
+class TagsAutocompleteTests(TestCase):
+    def setUp(self):
+        tag_index.invalidate()
+        self.addCleanup(tag_index.invalidate)
+        author = create_user('author')
+        questions = [
+            Question.objects.create(title=f'title {number}', text='text', author=author) for number in range(2)
+        ]
+        Tag.objects.create(tag_name='Python').question.add(*questions)
+        Tag.objects.create(tag_name='pytest').question.add(questions[0])
+        Tag.objects.create(tag_name='django')
+        self.questions = questions
+
+    def complete(self, prefix):
+        response = self.client.get(reverse('tags-autocomplete-view'), {'q': prefix})
+        self.assertEqual(response.status_code, 200)
+        return [tag['tag_name'] for tag in response.json()['tags']]
+
+    def test_prefix_matches_case_insensitively_most_used_first(self):
+        self.assertEqual(self.complete('PY'), ['Python', 'pytest'])
+        self.assertEqual(self.complete('dj'), ['django'])
+        self.assertEqual(self.complete('  '), [])
+        self.assertEqual(self.complete('ruby'), [])
+
+    def test_loaded_index_follows_tag_changes(self):
+        self.assertEqual(self.complete('py'), ['Python', 'pytest'])
+
+        Tag.objects.create(tag_name='pyramid').question.add(*self.questions)
+        Tag.objects.get(tag_name='Python').delete()
+        self.assertEqual(self.complete('py'), ['pyramid', 'pytest'])
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.author = create_user('author')
+        self.reader = create_user('reader')
+        self.question = Question.objects.create(title='title', text='text', author=self.author)
+        self.tag = Tag.objects.create(tag_name='python')
+        self.tag.question.add(self.question)
+
+    def get_page(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_like_purges_pages_of_the_question(self):
+        other_question = Question.objects.create(title='other', text='text', author=self.author)
+        paths = [
+            reverse('question-view', args=[self.question.pk]),
+            reverse('tag-view', args=[self.tag.tag_name]),
+            reverse('index-view'),
+            reverse('question-view', args=[other_question.pk]),
+        ]
+        for path in paths:
+            self.assertEqual(self.get_page(path)['X-Page-Cache'], 'MISS')
+            self.assertEqual(self.get_page(path)['X-Page-Cache'], 'HIT')
+
+        Like.objects.create(user=self.reader, question=self.question)
+        cache_statuses = [self.get_page(path)['X-Page-Cache'] for path in paths]
+        self.assertEqual(cache_statuses, ['MISS', 'MISS', 'MISS', 'HIT'])
+
+    def test_authenticated_users_bypass_page_cache(self):
+        path = reverse('question-view', args=[self.question.pk])
+        self.get_page(path)
+        self.client.force_login(self.reader)
+        self.assertNotIn('X-Page-Cache', self.get_page(path))
+
+    def test_cached_pages_carry_no_csrf_token(self):
+        path = reverse('index-view')
+        self.get_page(path)
+        response = self.get_page(path)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertNotIn('csrfmiddlewaretoken', response.content.decode())
+        self.assertNotIn('csrftoken', response.cookies)
+
+
+class QuestionPageTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.author = create_user('author')
+        self.question = Question.objects.create(title='title', text='text', author=self.author)
+
+    def test_unknown_question_is_not_found(self):
+        response = self.client.get(reverse('question-view', args=[self.question.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_correct_answers_come_first(self):
+        Answer.objects.create(text='first answer', question=self.question, author=self.author)
+        Answer.objects.create(text='correct answer', question=self.question, author=self.author, correct=True)
+
+        response = self.client.get(reverse('question-view', args=[self.question.pk]))
+        answers = [item['answer'].text for item in response.context['answers'].object_list]
+        self.assertEqual(answers, ['correct answer', 'first answer'])
+
+
+class AnswerCardsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_edited_answer_card_is_rendered_again(self):
+        author = create_user('author')
+        question = Question.objects.create(title='title', text='text', author=author)
+        answer = Answer.objects.create(text='first text', question=question, author=author)
+        answer_cards.render([Answer.objects.select_related('author__profile').get(pk=answer.pk)])
+
+        answer.text = 'edited text'
+        answer.save()
+        card, = answer_cards.render([Answer.objects.select_related('author__profile').get(pk=answer.pk)])
+        self.assertIn('edited text', card)
+
+
+class KeysetPaginationTests(TestCase):
+    ORDERING = ('-time', '-id')
+
+    def setUp(self):
+        author = create_user('author')
+        questions = Question.objects.bulk_create([
+            Question(title=f'title {number}', text='text', author=author) for number in range(12)
+        ])
+        # Equal times make the cursor rely on the id tie breaker
+        Question.objects.filter(pk__in=[question.pk for question in questions[:6]]) \
+            .update(time=questions[0].time)
+        self.expected_ids = list(Question.objects.order_by(*self.ORDERING).values_list('pk', flat=True))
+        self.paginator = KeysetPaginator(Question.objects.all(), 5, self.ORDERING)
+
+    def test_after_and_before_cursors_round_trip(self):
+        pages = [self.paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(self.paginator.get_page(after=pages[-1].last_cursor))
+        forward_ids = [question.pk for page in pages for question in page.object_list]
+        self.assertEqual(forward_ids, self.expected_ids)
+        self.assertFalse(pages[0].has_previous())
+
+        backward_pages = [pages[-1]]
+        while backward_pages[-1].has_previous():
+            backward_pages.append(self.paginator.get_page(before=backward_pages[-1].first_cursor))
+        backward_ids = [question.pk for page in reversed(backward_pages) for question in page.object_list]
+        self.assertEqual(backward_ids, self.expected_ids)
+
+    def test_invalid_cursor_gives_first_page(self):
+        page = self.paginator.get_page(after='not,a,cursor')
+        self.assertEqual([question.pk for question in page.object_list], self.expected_ids[:5])
+
+    def test_out_of_range_cursor_id_gives_first_page(self):
+        time = Question.objects.get(pk=self.expected_ids[0]).time
+        page = self.paginator.get_page(after=f'{time},{10 ** 30}')
+        self.assertEqual([question.pk for question in page.object_list], self.expected_ids[:5])
+
+    def test_huge_page_numbers_give_empty_pages(self):
+        question_id = self.expected_ids[0]
+        for path in [
+            reverse('index-view') + f'?page={10 ** 20}',
+            reverse('question-view', args=[question_id]) + f'?page={10 ** 20}',
+            reverse('index-view') + f'?after=2020-01-01 00:00:00,{10 ** 30}',
+        ]:
+            self.assertEqual(self.client.get(path).status_code, 200)
+        self.assertEqual(WindowPaginator(Question.objects.all(), 5).get_page(10 ** 20).object_list, [])
+
+
+class QuestionSearchTests(TestCase):
+    def setUp(self):
+        author = create_user('author')
+        self.question = Question.objects.create(title='sqlite title', text='virtual tables', author=author)
+
+    def get_found_ids(self, query):
+        return list(Question.objects.search(query).values_list('pk', flat=True))
+
+    def test_inserted_question_is_found(self):
+        self.assertEqual(self.get_found_ids('sqlite'), [self.question.pk])
+        self.assertEqual(self.get_found_ids('virtual'), [self.question.pk])
+
+    def test_updated_question_is_found_by_new_words_only(self):
+        self.question.title = 'postgres title'
+        self.question.save()
+        self.assertEqual(self.get_found_ids('sqlite'), [])
+        self.assertEqual(self.get_found_ids('postgres'), [self.question.pk])
+
+    def test_deleted_question_is_not_found(self):
+        self.question.delete()
+        self.assertEqual(self.get_found_ids('sqlite'), [])
+
+
+class FillDataTests(TestCase):
+    # 10 questions in shards of 3
+    OPTIONS = {'scale': 10000, 'seed': 1, 'shard_size': 3, 'workers': 1}
+
+    def setUp(self):
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint = Path(checkpoint_dir.name) / 'checkpoint.json'
+
+    def fill(self):
+        stdout = io.StringIO()
+        call_command('filldata', checkpoint=str(self.checkpoint), stdout=stdout, **self.OPTIONS)
+        return stdout.getvalue()
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        write_shard = filldata.Command.write_shard
+
+        def write_first_shard_only(command, shard_rows):
+            if command.checkpoint['completed_shards']:
+                raise RuntimeError('interrupted')
+            write_shard(command, shard_rows)
+
+        with mock.patch.object(filldata.Command, 'write_shard', write_first_shard_only):
+            with self.assertRaisesMessage(RuntimeError, 'interrupted'):
+                self.fill()
+        self.assertEqual(Question.objects.count(), 3)
+
+        self.assertIn('resuming with 1 completed shards', self.fill())
+        self.assertFalse(self.checkpoint.exists())
+        question_ids = list(Question.objects.order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(question_ids, list(range(question_ids[0], question_ids[0] + 10)))
+
+        counters = list(Question.objects.order_by('pk').values_list('likes_count', 'answers_count'))
+        Question.objects.recount_counters()
+        self.assertEqual(counters, list(Question.objects.order_by('pk').values_list('likes_count', 'answers_count')))
+
+    def test_generated_answer_times_are_kept(self):
+        self.fill()
+        answer_times = set(Answer.objects.values_list('time', flat=True))
+        self.assertGreater(len(answer_times), 1)
+        self.assertLessEqual(max(answer_times), timezone.now())
+
+
+class ExplainQueriesTests(TestCase):
+    def test_report_runs_on_all_pages(self):
+        author = create_user('author')
+        question = Question.objects.create(title='title', text='text', author=author)
+        Tag.objects.create(tag_name='python').question.add(question)
+
+        stdout = io.StringIO()
+        call_command('explainqueries', stdout=stdout)
+        self.assertIn('SUCCESS', stdout.getvalue())
+
+    def test_only_bounded_scans_of_ordered_indexes_pass(self):
+        get_problem = explainqueries.Command.get_problem
+        ordered_indexes = explainqueries.Command.get_ordered_index_names()
+        self.assertIn('question_new_idx', ordered_indexes)
+
+        sql = 'SELECT * FROM app_question ORDER BY time DESC, id DESC LIMIT 6'
+        row = 'SCAN app_question USING INDEX question_new_idx'
+        self.assertIsNone(get_problem(sql, [row], row, ordered_indexes))
+        self.assertEqual(get_problem(sql.replace(' LIMIT 6', ''), [row], row, ordered_indexes), 'index scan')
+        sort = 'USE TEMP B-TREE FOR ORDER BY'
+        self.assertEqual(get_problem(sql, [row, sort], row, ordered_indexes), 'index scan')
+        self.assertEqual(get_problem(sql, [row, sort], sort, ordered_indexes), 'sort')
+
+        row = 'SCAN app_tag USING COVERING INDEX sqlite_autoindex_app_tag_1'
+        self.assertEqual(get_problem(sql, [row], row, ordered_indexes), 'index scan')
+        row = 'SCAN app_tag'
+        self.assertEqual(get_problem(sql, [row], row, ordered_indexes), 'table scan')
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrate the database back to migrate_from, so that old rows can be made for migrate_to"""
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        return executor.loader.project_state(self.migrate_to).apps
+
+
+class UniqueTagNamesMigrationTests(MigrationTestCase):
+    migrate_from = [('app', '0005_hot_snapshot')]
+    migrate_to = [('app', '0006_unique_tag_name')]
+
+    def test_duplicate_tags_are_merged_into_the_oldest(self):
+        user = self.apps.get_model('auth', 'User').objects.create(username='user')
+        OldQuestion = self.apps.get_model('app', 'Question')
+        first = OldQuestion.objects.create(title='first', text='text', author_id=user.pk)
+        second = OldQuestion.objects.create(title='second', text='text', author_id=user.pk)
+        OldTag = self.apps.get_model('app', 'Tag')
+        survivor = OldTag.objects.create(tag_name='python')
+        duplicate = OldTag.objects.create(tag_name='python')
+        survivor.question.add(first)
+        duplicate.question.add(first, second)
+
+        tag = self.migrate().get_model('app', 'Tag').objects.get(tag_name='python')
+        self.assertEqual(tag.pk, survivor.pk)
+        self.assertEqual(sorted(tag.question.values_list('pk', flat=True)), [first.pk, second.pk])
+
+
+class DuplicateLikesMigrationTests(MigrationTestCase):
+    migrate_from = [('app', '0007_question_time_default')]
+    migrate_to = [('app', '0008_query_indexes')]
+
+    def test_duplicate_likes_are_merged_and_recounted(self):
+        user = self.apps.get_model('auth', 'User').objects.create(username='user')
+        OldQuestion = self.apps.get_model('app', 'Question')
+        question = OldQuestion.objects.create(title='title', text='text', author_id=user.pk, likes_count=2)
+        OldLike = self.apps.get_model('app', 'Like')
+        OldLike.objects.bulk_create([OldLike(user_id=user.pk, question_id=question.pk) for _ in range(2)])
+
+        apps = self.migrate()
+        self.assertEqual(apps.get_model('app', 'Like').objects.count(), 1)
+        self.assertEqual(apps.get_model('app', 'Question').objects.get(pk=question.pk).likes_count, 1)
+
+
+class StaticFilesMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        (Path(static_root.name) / 'site.css').write_text('body { margin: 0; }\n' * 100)
+        write_encoded_manifest(static_root.name, {
+            'site.css': {'immutable': True, 'encodings': write_encoded_variants(static_root.name, 'site.css')},
+        })
+        settings_override = override_settings(STATIC_ROOT=static_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('view'))
+
+    def get(self, accept_encoding=None, path='/static/site.css'):
+        headers = {} if accept_encoding is None else {'HTTP_ACCEPT_ENCODING': accept_encoding}
+        response = self.middleware(RequestFactory().get(path, **headers))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_preferred_accepted_encoding_is_served(self):
+        response = self.get('gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_identity_without_accepted_encodings(self):
+        self.assertNotIn('Content-Encoding', self.get())
+        self.assertNotIn('Content-Encoding', self.get('gzip;q=0'))
+
+    def test_malformed_quality_does_not_accept_encoding(self):
+        self.assertNotIn('Content-Encoding', self.get('gzip;q=abc'))
+
+    def test_wildcard_accepts_unlisted_encodings(self):
+        self.assertEqual(self.get('*')['Content-Encoding'], available_encodings()[0])
+        self.assertNotIn('Content-Encoding', self.get('*, ' + ', '.join(f'{e};q=0' for e in available_encodings())))
+
+    def test_other_paths_reach_the_view(self):
+        self.assertEqual(self.get(path='/static/missing.css').content, b'view')
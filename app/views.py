@@ -1,64 +1,97 @@
 from django.shortcuts import render, redirect
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.urls import reverse
 from django.views import View
-from django.core.paginator import Paginator
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import ensure_csrf_cookie
 
-from app.models import Question, Tag, Like, Answer, Profile
+from app.autocomplete import tag_index
+from app.cards import question_cards, answer_cards
+from app.likes import likes_counter
+from app.conditional import ConditionalGetView
+from app.models import Question, Tag, Like, Answer, Profile, HotSnapshot
+from app.pagecache import page_cache
+from app.pagination import make_paginator
+from app.perf import views_stats
 
 
-def load_question_data(question):
-    question_item = {
-        'question': question,
-        'tags': Tag.objects.question_tags(question.pk),
-        'likes_counter': Like.objects.count_question_likes(question.id),
-        'answers_counter': Answer.objects.count_question_answers(question.id),
-        'author_avatar': Profile.objects.get_avatar_url(question.author.id)
-    }
-    return question_item
+def load_question_cards(questions):
+    questions = list(questions)
+    return [
+        {'question': question, 'card': card}
+        for question, card in zip(questions, question_cards.render(questions))
+    ]
 
 
-class DefaultQuestionsContainPageView(View):
+def load_answer_cards(answers):
+    answers = list(answers)
+    return [
+        {'answer': answer, 'card': card}
+        for answer, card in zip(answers, answer_cards.render(answers))
+    ]
+
+
+def load_sidebar_data():
+    return {'tags': Tag.objects.get_top_tags(), 'best_members': Profile.objects.get_best_members()}
+
+
+class DefaultQuestionsContainPageView(ConditionalGetView):
     QUESTIONS_PER_PAGE = 5
     template = 'base.html'
     question_objects_template_naming = 'questions'
-    questions_loader = Question.objects.all
+    questions_loader = Question.objects.get_new
     loader_specific_args = []
     loader_specific_kwargs = dict()
+    keyset_ordering = None
+    keyset_pagination = False
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.paginator = None
 
     def load_questions(self, *args, **kwargs):
-        loaded_questions = self.questions_loader(*args, **kwargs)
-        result_questions_query = []
-        for question in loaded_questions:
-            question_item = load_question_data(question)
-            result_questions_query.append(question_item)
-        return result_questions_query
-
-    def resolve_pagination(self, page: int):
-        rendering_page_objects = self.paginator.get_page(page)
+        return self.questions_loader(*args, **kwargs)
+
+    def decorate_questions(self, questions):
+        return load_question_cards(questions)
+
+    def resolve_pagination(self, request: HttpRequest):
+        rendering_page_objects = self.paginator.get_request_page(request)
+        rendering_page_objects.object_list = self.decorate_questions(rendering_page_objects.object_list)
         return rendering_page_objects
 
+    def get_validator(self, request, *args, **kwargs):
+        last_change = Question.objects.get_last_change()
+        if last_change is None:
+            return None
+        generation = Question.objects.get_listings_generation()
+        return max(last_change['changed_at'], generation), [last_change['hot_snapshot'], generation.isoformat()]
+
     def get_view_specific_data(self, request, *args, **kwargs):
-        return {'tags': Tag.objects.get_top_tags()}
+        return dict()
 
-    def prepare_questions_query(self):
+    def prepare_questions_query(self, request: HttpRequest):
         questions_objects = self.load_questions(
             *self.loader_specific_args,
             **self.loader_specific_kwargs
         )
-        self.paginator = Paginator(questions_objects, self.QUESTIONS_PER_PAGE)
+        self.paginator = make_paginator(
+            request,
+            questions_objects,
+            self.QUESTIONS_PER_PAGE,
+            self.keyset_ordering,
+            self.keyset_pagination
+        )
+
+    def get_questions_page(self, request: HttpRequest):
+        self.prepare_questions_query(request)
+        return self.resolve_pagination(request)
 
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         passing_arguments = self.get_view_specific_data(request, *args, **kwargs)
-        self.prepare_questions_query()
-
-        page_number = int(request.GET.get('page', 1))
-        question_objects = self.resolve_pagination(page_number)
-
-        passing_arguments.update({self.question_objects_template_naming: question_objects})
+        passing_arguments.update(load_sidebar_data())
+        passing_arguments.update({self.question_objects_template_naming: self.get_questions_page(request)})
 
         return render(
             request,
@@ -69,6 +102,7 @@ class DefaultQuestionsContainPageView(View):
 
 class IndexView(DefaultQuestionsContainPageView):
     template = 'index.html'
+    keyset_ordering = ('-time', '-id')
 
 
 class HotQuestionsView(DefaultQuestionsContainPageView):
@@ -78,56 +112,145 @@ class HotQuestionsView(DefaultQuestionsContainPageView):
     loader_specific_args = []
     loader_specific_kwargs = dict(likes_to_hot=LIKES_TO_HOT)
 
+    def load_questions(self, *args, **kwargs):
+        snapshot = HotSnapshot.objects.get_latest()
+        if snapshot is None:
+            return super().load_questions(*args, **kwargs)
+        return snapshot.get_questions()
+
 
 class TagQuestionsView(DefaultQuestionsContainPageView):
     template = 'tag.html'
     questions_loader = Question.objects.get_tagged_question
     loader_specific_args = []
     loader_specific_kwargs = dict()
+    keyset_ordering = ('-time', '-id')
+
+    def get_view_specific_data(self, request, *args, **kwargs):
+        self.loader_specific_kwargs = {'tag_name': kwargs.get('tag_name')}
+        return {'tag_name': kwargs.get('tag_name')}
+
+
+class SearchQuestionsView(DefaultQuestionsContainPageView):
+    template = 'search.html'
+    questions_loader = Question.objects.search
+    loader_specific_args = []
+    loader_specific_kwargs = dict()
 
     def get_view_specific_data(self, request, *args, **kwargs):
-        self.loader_specific_kwargs.update({'tag_name': kwargs.get('tag_name')})
-        return {'tag_name': kwargs.get('tag_name'), 'tags': Tag.objects.get_top_tags()}
+        query = request.GET.get('q', '')
+        self.loader_specific_kwargs = {'query': query}
+        return {'query': query}
 
 
-class ConcreteQuestionView(View):
+class ConcreteQuestionView(ConditionalGetView):
     ANSWERS_PER_PAGE = 5
+    keyset_ordering = ('-correct', 'time', 'id')
+    keyset_pagination = False
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.paginator = None
 
-    def resolve_pagination(self, page: int):
-        rendering_page = self.paginator.get_page(page)
+    def resolve_pagination(self, request: HttpRequest):
+        rendering_page = self.paginator.get_request_page(request)
+        rendering_page.object_list = load_answer_cards(rendering_page.object_list)
         return rendering_page
 
-    def create_answer_objects(self, question):
-        answers = Answer.objects.question_answers(question.pk)
-        answers_set = []
-        for answer in answers:
-            item = {
-                'answer': answer,
-                'author_avatar': Profile.objects.get_avatar_url(answer.author.pk)
-            }
-            answers_set.append(item)
+    def prepare_questions_query(self, request: HttpRequest, question_id):
+        answer_objects = Answer.objects.get_question_answers(question_id)
+        self.paginator = make_paginator(
+            request,
+            answer_objects,
+            self.ANSWERS_PER_PAGE,
+            self.keyset_ordering,
+            self.keyset_pagination
+        )
+
+    def get_validator(self, request, question_id):
+        return Question.objects.get_changed_at(question_id), []
 
-        return answers_set
+    def get_question_data(self, question_id):
+        question = Question.objects.get_question(question_id)
+        if question is None:
+            raise Http404('No such question')
 
-    def prepare_questions_query(self, question):
-        # answer_objects = Answer.objects.question_answers(question.pk)
-        answer_objects = self.create_answer_objects(question)
-        self.paginator = Paginator(answer_objects, self.ANSWERS_PER_PAGE)
+        return {
+            'question': question,
+            'tags': question.tag_set.all(),
+            'likes_counter': question.likes_count,
+            'answers_counter': question.answers_count,
+            'author_avatar': Profile.objects.get_users_avatars([question.author])[question.author_id],
+        }
+
+    def get_answers_page(self, request: HttpRequest, question_id):
+        self.prepare_questions_query(request, question_id)
+        return self.resolve_pagination(request)
 
     def get(self, request: HttpRequest, question_id) -> HttpResponse:
-        question = Question.objects.filter(pk__exact=question_id)[0]
-        self.prepare_questions_query(question)
-        page_number = int(request.GET.get('page', 1))
-        passing_arguments = {'tags': Tag.objects.get_top_tags()}
-        passing_arguments.update({'question': load_question_data(question)})
-        passing_arguments.update({'answers': self.resolve_pagination(page_number)})
+        passing_arguments = load_sidebar_data()
+        passing_arguments.update({'question': self.get_question_data(question_id)})
+        passing_arguments.update({'answers': self.get_answers_page(request, question_id)})
         return render(request, "question.html", passing_arguments)
 
 
+class LikeView(View):
+    """Toggle the like of the current user, or set it with liked=1/0 so that retries are harmless.
+
+    Like forms of the cached cards carry no CSRF token, they are sent by likes.js only and
+    answered with JSON. Pages may come from the anonymous page cache without a CSRF cookie,
+    so likes.js gets one from GET, which also answers the current state of the like.
+    """
+
+    @staticmethod
+    def make_like_response(question_id, liked):
+        likes_count = Question.objects.filter(pk=question_id).values_list('likes_count', flat=True).first()
+        if likes_count is None:
+            raise Http404('No such question')
+        return JsonResponse({'liked': liked, 'likes_count': likes_count + likes_counter.pending(question_id)})
+
+    @method_decorator(ensure_csrf_cookie)
+    def get(self, request: HttpRequest, question_id) -> HttpResponse:
+        liked = request.user.is_authenticated and Like.objects.is_liked(request.user.pk, question_id)
+        return self.make_like_response(question_id, liked)
+
+    def post(self, request: HttpRequest, question_id) -> HttpResponse:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'login required', 'login_url': reverse('login-view')}, status=401)
+
+        if not Question.objects.filter(pk=question_id).exists():
+            raise Http404('No such question')
+
+        liked = request.POST.get('liked')
+        if liked is None:
+            liked = Like.objects.toggle_like(request.user.pk, question_id)
+        elif liked in ('0', '1'):
+            liked = liked == '1'
+            Like.objects.set_like(request.user.pk, question_id, liked)
+        else:
+            return JsonResponse({'error': 'liked must be 0 or 1'}, status=400)
+
+        return self.make_like_response(question_id, liked)
+
+
+class TagsAutocompleteView(View):
+    def get(self, request: HttpRequest) -> HttpResponse:
+        return JsonResponse({'tags': tag_index.complete(request.GET.get('q', ''))})
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class PerformanceView(View):
+    def get(self, request: HttpRequest) -> HttpResponse:
+        return render(request, 'perf.html', {
+            'views_stats': views_stats.aggregate(),
+            'cards_stats': [
+                ('question', question_cards.stats.aggregate()),
+                ('answer', answer_cards.stats.aggregate()),
+            ],
+            'pages_stats': page_cache.stats.aggregate(),
+        })
+
+
 class LoginView(View):
     def prepare_arguments(self, request, *args, **kwargs):
         return dict()
@@ -152,7 +275,7 @@ class RegisterView(View):
 
 class AskView(View):
     def prepare_arguments(self, request, *args, **kwargs):
-        return {'tags': get_tags()}
+        return load_sidebar_data()
 
     def get(self, request: HttpRequest) -> HttpResponse:
         return render(request, 'ask.html', self.prepare_arguments(request))
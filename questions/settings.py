@@ -39,6 +39,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.StaticFilesMiddleware',
+    'app.middleware.PerformanceMiddleware',
+    'app.middleware.PageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,7 +55,7 @@ ROOT_URLCONF = 'questions.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'app.perf.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,9 +78,100 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60 * 10,
     }
 }
 
+# SQLite tuning, applied to every new connection by app.db.apply_pragmas
+# https://www.sqlite.org/pragma.html
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# Read-only connection to the same database file, reads are sent to it by app.db.ReadReplicaRouter
+# https://docs.djangoproject.com/en/4.0/topics/db/multi-db/
+
+SQLITE_READ_REPLICA = False
+DATABASE_READ_ALIAS = 'replica'
+
+if SQLITE_READ_REPLICA:
+    DATABASES[DATABASE_READ_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+        'OPTIONS': {'uri': True},
+        'CONN_MAX_AGE': 60 * 10,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['app.db.ReadReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cards',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+TOP_TAGS_CACHE_TIMEOUT = 60 * 5
+BEST_MEMBERS_CACHE_TIMEOUT = 60
+
+TAG_INDEX_MAX_AGE = 60 * 10
+
+CARDS_CACHE = 'cards'
+CARDS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Full pages of anonymous readers, see app.pagecache. Purges reach only the cache of the
+# process making the change, run several workers with a shared backend such as memcached.
+PAGE_CACHE = 'pages'
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Likes counters, LIKES_BUFFERED coalesces counter writes, see app.likes.LikesCounter
+
+LIKES_BUFFERED = False
+LIKES_FLUSH_INTERVAL = 1.0
+LIKES_FLUSH_BATCH = 500
+
+# Performance instrumentation
+
+PERF_QUERY_BUDGET = 20
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'app.perf': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -114,6 +208,10 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static/'
 ]
+# Fingerprinted copies and their precompressed variants are made by buildstatic
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_STORAGE = 'app.assets.ManifestStaticFilesStorage'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -121,3 +219,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_ROOT = f'{BASE_DIR}/media'
 MEDIA_URL = '/media/'
+
+# Avatar thumbnails, AVATAR_SIZE and its double are shown on the cards
+
+AVATAR_SIZE = 50
+AVATAR_THUMBNAIL_SIZES = (50, 100)
+AVATAR_THUMBNAIL_FORMAT = 'WEBP'
+AVATAR_THUMBNAIL_QUALITY = 85
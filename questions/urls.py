@@ -18,14 +18,24 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 
-from app import views
+from app import async_views, views
 
 urlpatterns = [
                   path('admin/', admin.site.urls),
+                  path('_perf/', views.PerformanceView.as_view(), name='perf-view'),
                   path('', views.IndexView.as_view(), name='index-view'),
                   path('hot/', views.HotQuestionsView.as_view(), name='hot-view'),
                   path('question/<int:question_id>', views.ConcreteQuestionView.as_view(), name='question-view'),
+                  path('question/<int:question_id>/like', views.LikeView.as_view(), name='like-view'),
                   path('tag/<str:tag_name>/', views.TagQuestionsView.as_view(), name='tag-view'),
+                  path('search/', views.SearchQuestionsView.as_view(), name='search-view'),
+                  path('tags/autocomplete', views.TagsAutocompleteView.as_view(), name='tags-autocomplete-view'),
+                  path('async/', async_views.AsyncIndexView.as_view(), name='async-index-view'),
+                  path('async/hot/', async_views.AsyncHotQuestionsView.as_view(), name='async-hot-view'),
+                  path('async/question/<int:question_id>', async_views.AsyncConcreteQuestionView.as_view(),
+                       name='async-question-view'),
+                  path('async/tag/<str:tag_name>/', async_views.AsyncTagQuestionsView.as_view(), name='async-tag-view'),
+                  path('async/search/', async_views.AsyncSearchQuestionsView.as_view(), name='async-search-view'),
                   path('login/', views.LoginView.as_view(), name='login-view'),
                   path('signup/', views.RegisterView.as_view(), name='register-view'),
                   path('ask/', views.AskView.as_view(), name='ask-view'),
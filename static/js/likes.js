@@ -0,0 +1,68 @@
+// Cards and anonymous pages are cached and shared between users, so neither like forms
+// nor pages carry a CSRF token. The like button works through this script only: the token
+// is read from the CSRF cookie, which a GET of the like endpoint sets when it is missing.
+function getCsrfToken() {
+    var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : null;
+}
+
+function readLikeResponse(form, response) {
+    var isJson = (response.headers.get('Content-Type') || '').indexOf('application/json') === 0;
+    if (!isJson) {
+        throw new Error('Like failed with status ' + response.status);
+    }
+    return response.json().then(function (data) {
+        if (response.status === 401) {
+            window.location.href = data.login_url;
+            return null;
+        }
+        if (!response.ok) {
+            throw new Error(data.error || 'Like failed with status ' + response.status);
+        }
+        form.querySelector('.likes-counter').textContent = data.likes_count;
+        form.classList.toggle('liked', data.liked);
+        form.dataset.liked = data.liked ? '1' : '0';
+        return data;
+    });
+}
+
+// Cached cards do not know whether the reader likes the question, the first click asks the
+// endpoint. The GET also sets the CSRF cookie when it is missing.
+function ensureLikeState(form) {
+    if (form.dataset.liked && getCsrfToken()) {
+        return Promise.resolve(form.dataset.liked);
+    }
+    return fetch(form.action, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+        .then(function (response) {
+            return readLikeResponse(form, response);
+        })
+        .then(function () {
+            return form.dataset.liked;
+        });
+}
+
+document.addEventListener('submit', function (event) {
+    var form = event.target.closest('.like-form');
+    if (!form) {
+        return;
+    }
+    event.preventDefault();
+
+    // The wanted state is sent instead of a toggle, so a retried request can not undo the like
+    ensureLikeState(form).then(function (liked) {
+        return fetch(form.action, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCsrfToken() || '',
+                'Accept': 'application/json',
+                'Content-Type': 'application/x-www-form-urlencoded'
+            },
+            body: 'liked=' + (liked === '1' ? '0' : '1'),
+            credentials: 'same-origin'
+        });
+    }).then(function (response) {
+        return readLikeResponse(form, response);
+    }).catch(function (error) {
+        console.error(error);
+    });
+});
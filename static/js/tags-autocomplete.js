@@ -0,0 +1,33 @@
+// Suggests tags for the last comma separated name in the tags input. Every suggestion
+// keeps the names typed before it, so that picking it from the datalist completes the input.
+document.querySelectorAll('input[data-autocomplete-url]').forEach(function (input) {
+    var suggestions = document.getElementById(input.getAttribute('list'));
+    var lastPrefix = null;
+
+    input.addEventListener('input', function () {
+        var parts = input.value.split(',');
+        var prefix = parts.pop().trim();
+        if (prefix === lastPrefix) {
+            return;
+        }
+        lastPrefix = prefix;
+
+        var typed = parts.map(function (part) {
+            return part.trim();
+        }).filter(Boolean);
+        var url = input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(prefix);
+        fetch(url, {headers: {'Accept': 'application/json'}}).then(function (response) {
+            return response.json();
+        }).then(function (data) {
+            if (prefix !== lastPrefix) {
+                return;
+            }
+            suggestions.replaceChildren.apply(suggestions, data.tags.map(function (tag) {
+                var option = document.createElement('option');
+                option.value = typed.concat([tag.tag_name]).join(', ');
+                option.label = tag.tag_name + ' (' + tag.total + ')';
+                return option;
+            }));
+        });
+    });
+});